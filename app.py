@@ -1,18 +1,297 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List
+import asyncio
+import json
+import os
+import threading
+import time
+import zlib
 import torch
 from transformers import RobertaForSequenceClassification, RobertaTokenizer
-
-app = FastAPI()
+from backends import load_backend, stub_predict
+from batching import MicroBatcher
+from cache import PredictionCache
+from inference import pool_windows, predict_ids, predict_logits, split_windows
+from metrics import REGISTRY, collect_timings, server_timing, span
+from scoring import LABELS, STAR_WEIGHTS
+from workers import WorkerPool
 
 device = torch.device("cpu")
-model_path = "hetbhalani/roberta-enhanced-for-sentiment"
+#hub id or a local snapshot directory
+model_path = os.getenv("MODEL_PATH", "hetbhalani/roberta-enhanced-for-sentiment")
+#1 = never touch the network, the snapshot must already be on disk
+MODEL_LOCAL_ONLY = os.getenv("MODEL_LOCAL_ONLY", "0") == "1"
+
+#eager (fp32), int8 (dynamic quantization), torchscript or onnx. stub loads no model and
+#answers after STUB_LATENCY_MS, for load tests of everything around the model
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")
+
+#micro-batching knobs, a batch runs once it has this many texts or after this many ms
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "32"))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", "10"))
+
+#reviews are cut at MAX_LENGTH tokens, then sorted by length and split so that
+#rows * longest row in each sub-batch stays under TOKEN_BUDGET
+MAX_LENGTH = int(os.getenv("MAX_LENGTH", "128"))
+TOKEN_BUDGET = int(os.getenv("TOKEN_BUDGET", "4096"))
+
+#truncate scores only the first MAX_LENGTH tokens of a review. window scores long reviews
+#as overlapping MAX_LENGTH token windows WINDOW_STRIDE tokens apart and averages them,
+#with at most MAX_WINDOWS_PER_REQUEST windows per request (long reviews are thinned first)
+LONG_REVIEWS = os.getenv("LONG_REVIEWS", "truncate")
+WINDOW_STRIDE = int(os.getenv("WINDOW_STRIDE", "96"))
+MAX_WINDOWS_PER_REQUEST = int(os.getenv("MAX_WINDOWS_PER_REQUEST", "256"))
+
+#prediction cache, 0 entries disables it and a ttl of 0 never expires
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "0"))
+
+#0 runs the model in this process, N > 0 starts N worker processes with their own
+#threads that share one read-only copy of the weights
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", "0"))
+#torch intra-op threads per worker (or for this process), 0 splits the cores evenly
+#between workers and leaves torch's default when running in-process
+THREADS_PER_WORKER = int(os.getenv("THREADS_PER_WORKER", "0"))
+
+#reviews per result line on /predict/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "16"))
+STREAM_MAX_IN_FLIGHT = 4
+
+#largest request body accepted once a gzip body is inflated, so a tiny upload cannot expand without bound
+MAX_INFLATED_BYTES = int(os.getenv("MAX_INFLATED_BYTES", str(64 * 2 ** 20)))
+
+#warmup batch run before /readyz turns green, one pass per sequence length
+WARMUP_LENGTHS = [int(n) for n in os.getenv("WARMUP_LENGTHS", "16,64,128").split(",") if n.strip()]
+WARMUP_BATCH_SIZE = int(os.getenv("WARMUP_BATCH_SIZE", "8"))
+
+label_map = dict(enumerate(LABELS))
+
+REQUESTS = REGISTRY.counter("cinesense_http_requests_total", "HTTP requests by path and status", ["path", "status"])
+REQUEST_SECONDS = REGISTRY.histogram("cinesense_http_request_seconds", "HTTP request latency by path", ["path"])
+
+#filled in by load_model() on a background thread so uvicorn can bind the port right away
+model = None
+tokenizer = None
+forward = None
+pool = None
+batcher = None
+cache = None
+ready = threading.Event()
+load_error = None
+load_seconds = None
+
+
+def from_pretrained(cls, path):
+    #reuse the local snapshot without any network checks, only download when it is missing
+    try:
+        return cls.from_pretrained(path, local_files_only=True)
+    except OSError:
+        if MODEL_LOCAL_ONLY:
+            raise
+        return cls.from_pretrained(path)
+
+#runs the texts of every request in the batch, bucketed by length
+def run_model(texts):
+    return predict_logits(forward, tokenizer, texts, max_length=MAX_LENGTH,
+                          token_budget=TOKEN_BUDGET, device=device)
+
+#windowed mode, the texts were split into windows of token IDs before batching
+def run_model_windows(windows):
+    return predict_ids(forward, tokenizer, windows, token_budget=TOKEN_BUDGET, device=device)
+
+def windowed():
+    #the stub has no tokenizer to cut windows with, it always truncates
+    return LONG_REVIEWS == "window" and INFERENCE_BACKEND != "stub"
+
+#pays the first-call graph and allocator costs before real traffic arrives
+def warmup_batches():
+    batches = []
+    for length in WARMUP_LENGTHS:
+        #"movie" is a single token, so this gives roughly `length` tokens per text
+        text = " ".join(["movie"] * min(length, MAX_LENGTH))
+        batches.append([text] * WARMUP_BATCH_SIZE)
+    return batches
+
+#builds the model (or the worker pool) and returns the batch predict function and model revision
+def load_predictor():
+    global model, tokenizer, forward, pool
+    if INFERENCE_BACKEND == "stub":
+        #no weights at all, only the web, batching, cache and serialization layers are real
+        return (lambda texts: stub_predict(texts, MAX_LENGTH)), "stub"
+
+    model = from_pretrained(RobertaForSequenceClassification, model_path)
+    model.eval()
+    tokenizer = from_pretrained(RobertaTokenizer, model_path)
+    model.to(device)
+
+    if NUM_WORKERS > 0:
+        threads = THREADS_PER_WORKER or max(1, (os.cpu_count() or 1) // NUM_WORKERS)
+        pool = WorkerPool(model, tokenizer, NUM_WORKERS, threads, backend=INFERENCE_BACKEND,
+                          max_length=MAX_LENGTH, token_budget=TOKEN_BUDGET,
+                          warmup_batches=warmup_batches(), windowed=windowed())
+        predict_fn = pool.predict
+    else:
+        if THREADS_PER_WORKER:
+            torch.set_num_threads(THREADS_PER_WORKER)
+        forward = load_backend(INFERENCE_BACKEND, model, tokenizer)
+        for texts in warmup_batches():
+            run_model(texts)
+        predict_fn = run_model_windows if windowed() else run_model
+    return predict_fn, getattr(model.config, "_commit_hash", None) or "local"
+
+def load_model():
+    global batcher, cache, load_error, load_seconds
+    start = time.perf_counter()
+    if LONG_REVIEWS not in ("truncate", "window"):
+        load_error = f"Unknown LONG_REVIEWS mode {LONG_REVIEWS!r}, expected truncate or window"
+        print(load_error)
+        return
+    try:
+        predict_fn, model_revision = load_predictor()
+
+        #cached logits are only valid for this exact model revision, backend and truncation length
+        namespace = f"{model_path}@{model_revision}:{INFERENCE_BACKEND}:{MAX_LENGTH}"
+        if windowed():
+            namespace += f":window{WINDOW_STRIDE}"
+        cache = PredictionCache(namespace, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+
+        #one batch in flight per worker process
+        batcher = MicroBatcher(predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_BATCH_WAIT_MS / 1000,
+                               num_workers=max(1, NUM_WORKERS))
+    except Exception as e:
+        load_error = str(e)
+        print(f"Model failed to load: {e}")
+        return
+
+    load_seconds = time.perf_counter() - start
+    print(f"Model ready in {load_seconds:.1f}s")
+    ready.set()
+
+@asynccontextmanager
+async def lifespan(app):
+    threading.Thread(target=load_model, name="model-loader", daemon=True).start()
+    yield
+    if batcher is not None:
+        batcher.close()
+    if pool is not None:
+        pool.close()
+
+#inflates request bodies sent with Content-Encoding: gzip before any route reads them.
+#plain ASGI, the body is rewritten for every route including the streaming one
+class GzipRequestMiddleware:
+    def __init__(self, app, max_size=MAX_INFLATED_BYTES):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get("headers", ())) if scope["type"] == "http" else {}
+        if headers.get(b"content-encoding", b"").lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
+
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = []
+        size = 0
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                data = inflater.decompress(message.get("body", b""), self.max_size - size + 1)
+                size += len(data)
+                if size > self.max_size:
+                    await JSONResponse(status_code=413, content={"detail": "Request body too large"})(scope, receive, send)
+                    return
+                chunks.append(data)
+                if not message.get("more_body", False):
+                    break
+            if not inflater.eof:
+                raise zlib.error("truncated gzip stream")
+        except zlib.error:
+            await JSONResponse(status_code=400, content={"detail": "Invalid gzip body"})(scope, receive, send)
+            return
 
-model = RobertaForSequenceClassification.from_pretrained(model_path)
-model.eval()
-tokenizer = RobertaTokenizer.from_pretrained(model_path)
-model.to(device)
+        body = b"".join(chunks)
+        headers.pop(b"content-encoding")
+        headers.pop(b"transfer-encoding", None)
+        headers[b"content-length"] = str(len(body)).encode()
+        scope = dict(scope, headers=list(headers.items()))
+        sent = False
+
+        async def inflated_receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, inflated_receive, send)
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(GzipRequestMiddleware)
+
+REGISTRY.callback("cinesense_ready", "1 once the model is loaded and warmed up", lambda: int(ready.is_set()))
+REGISTRY.callback("cinesense_cache_lookups_total", "Prediction cache lookups by result",
+                  lambda: cache and {"hit": cache.stats()["hits"], "miss": cache.stats()["misses"]},
+                  kind="counter", label="result")
+REGISTRY.callback("cinesense_cache_entries", "Logits rows in the prediction cache",
+                  lambda: cache and cache.stats()["size"])
+
+#per-request stage breakdown, returned as a Server-Timing header with ?timings=1 or X-Timings: 1
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    start = time.perf_counter()
+    with collect_timings() as timings:
+        response = await call_next(request)
+    seconds = time.perf_counter() - start
+
+    #route template rather than the raw path, so ids in urls cannot blow up the label set
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    REQUESTS.inc(path=path, status=response.status_code)
+    REQUEST_SECONDS.observe(seconds, path=path)
+    if request.query_params.get("timings") == "1" or request.headers.get("x-timings") == "1":
+        response.headers["Server-Timing"] = server_timing({**timings, "total": seconds})
+    return response
+
+#logits for every text, only cache misses go to the model
+def predict_rows(texts):
+    with span("cache_lookup"):
+        keys = [cache.key(text) for text in texts]
+        rows = [cache.get(key) for key in keys]
+
+    #same review twice in one request only needs one forward pass
+    missing = {}
+    for i, row in enumerate(rows):
+        if row is None:
+            missing.setdefault(keys[i], []).append(i)
+
+    if missing:
+        unique = [texts[idxs[0]] for idxs in missing.values()]
+        if windowed():
+            #windows of every review in the request share the batcher's forward passes
+            windows, owners, weights, complete = split_windows(tokenizer, unique, MAX_LENGTH, WINDOW_STRIDE,
+                                                               MAX_WINDOWS_PER_REQUEST)
+            logits = pool_windows(batcher.predict(windows), owners, weights, len(unique))
+        else:
+            logits = batcher.predict(unique)
+            complete = [True] * len(unique)
+        for row, full, (key, idxs) in zip(logits, complete, missing.items()):
+            row = row.clone()
+            #a review that lost windows to the per-request cap would score differently on its own
+            if full:
+                cache.put(key, row)
+            for i in idxs:
+                rows[i] = row
+    return torch.stack(rows)
+
+def require_ready():
+    if not ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still loading")
 
 #pydantic model to get the list of movie reviews
 class MovieReviews(BaseModel):
@@ -20,15 +299,158 @@ class MovieReviews(BaseModel):
 
 @app.post('/predict')
 def sentiment_model_predict(movie_reviews: MovieReviews):
+    require_ready()
     texts = movie_reviews.reviews
-    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=128)
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    if not texts:
+        return {"sentiments": []}
 
-    with torch.no_grad():
-        outputs = model(**inputs)
-        preds = outputs.logits.argmax(-1).tolist()
+    logits = predict_rows(texts)
+    preds = logits.argmax(-1).tolist()
 
-    label_map = {0: "Negative", 1: "Neutral", 2: "Positive"}
     pred_list = [label_map[p] for p in preds]
 
     return {"sentiments": pred_list}
+
+class AggregateRequest(MovieReviews):
+    include_probabilities: bool = False
+
+#counts, star score and confidences for the whole list in one vectorized pass
+def summarize(logits, include_probabilities=False):
+    probs = torch.softmax(logits.float(), dim=-1)
+    confidence, preds = probs.max(dim=-1)
+    counts = torch.bincount(preds, minlength=len(LABELS))
+    weights = torch.tensor([float(STAR_WEIGHTS[label]) for label in LABELS])
+
+    total = len(preds)
+    #mean confidence of the reviews predicted as each class
+    confidence_sums = torch.zeros(len(LABELS)).index_add_(0, preds, confidence)
+    mean_confidence = confidence_sums / counts.clamp(min=1)
+
+    summary = {
+        "total": total,
+        "counts": {label: int(counts[i]) for i, label in enumerate(LABELS)},
+        "stars": round(float(counts.float() @ weights) / total, 2),
+        #expected stars per review under the model's probabilities, not just its top label
+        "confidence_weighted_stars": round(float((probs @ weights).mean()), 2),
+        "mean_confidence": {label: round(float(mean_confidence[i]), 4) if counts[i] else None
+                            for i, label in enumerate(LABELS)},
+    }
+    if include_probabilities:
+        summary["labels"] = LABELS
+        summary["probabilities"] = [[round(p, 4) for p in row] for row in probs.tolist()]
+    return summary
+
+@app.post('/predict/aggregate')
+def sentiment_model_aggregate(request: AggregateRequest):
+    require_ready()
+    if not request.reviews:
+        return {"total": 0, "counts": {label: 0 for label in LABELS}, "stars": None,
+                "confidence_weighted_stars": None, "mean_confidence": {label: None for label in LABELS}}
+
+    return summarize(predict_rows(request.reviews), request.include_probabilities)
+
+#yields lists of up to chunk_size reviews as the request body arrives
+async def read_review_chunks(request, chunk_size):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" not in content_type:
+        #plain {"reviews": [...]} body, nothing to stream on the way in
+        reviews = MovieReviews(**json.loads(await request.body())).reviews
+        for i in range(0, len(reviews), chunk_size):
+            yield reviews[i:i + chunk_size]
+        return
+
+    #one review per line, either a JSON string or {"review": "..."}
+    def parse_line(line):
+        item = json.loads(line)
+        if isinstance(item, dict):
+            item = item.get("review")
+        if not isinstance(item, str):
+            text = line[:100].decode("utf-8", "replace")
+            raise ValueError(f'expected a JSON string or {{"review": <string>}}, got {text}')
+        return item
+
+    chunk = []
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                chunk.append(parse_line(line))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if buffer.strip():
+        chunk.append(parse_line(buffer))
+    if chunk:
+        yield chunk
+
+def chunk_line(offset, logits):
+    preds = logits.argmax(-1).tolist()
+    return json.dumps({"offset": offset, "sentiments": [label_map[p] for p in preds]}) + "\n"
+
+@app.post('/predict/stream')
+async def sentiment_model_predict_stream(request: Request, chunk_size: int = STREAM_CHUNK_SIZE):
+    require_ready()
+    chunk_size = max(1, chunk_size)
+    limiter = asyncio.Semaphore(STREAM_MAX_IN_FLIGHT)
+
+    #a few chunks in flight at once so a huge list cannot take over the whole threadpool
+    async def score(chunk):
+        async with limiter:
+            return await run_in_threadpool(predict_rows, chunk)
+
+    #each chunk starts scoring as soon as it is read, while the rest is still uploading.
+    #the body has to be fully read before the response starts, starlette stops
+    #delivering it to us once the response is streaming
+    pending = []
+    offset = 0
+    try:
+        async for chunk in read_review_chunks(request, chunk_size):
+            pending.append((offset, asyncio.ensure_future(score(chunk))))
+            offset += len(chunk)
+    except (ValueError, KeyError, TypeError) as e:
+        for _, task in pending:
+            task.cancel()
+        raise HTTPException(status_code=400, detail=f"Invalid review stream: {e}")
+
+    async def results():
+        #emitted in request order as each chunk finishes
+        try:
+            for start, task in pending:
+                yield chunk_line(start, await task)
+        except Exception as e:
+            for _, task in pending:
+                task.cancel()
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        yield json.dumps({"done": True, "total": offset}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get('/cache/stats')
+def cache_stats():
+    require_ready()
+    return cache.stats()
+
+#liveness, the process is up even if the model is not loaded yet
+@app.get('/healthz')
+def healthz():
+    #a failed load never recovers on its own, report it so the container is marked unhealthy
+    if load_error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": load_error})
+    return {"status": "ok"}
+
+#readiness, only send traffic once the model is loaded and warmed up
+@app.get('/readyz')
+def readyz():
+    if ready.is_set():
+        return {"status": "ready", "backend": INFERENCE_BACKEND, "workers": NUM_WORKERS,
+                "load_seconds": round(load_seconds, 2)}
+    if load_error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": load_error})
+    return JSONResponse(status_code=503, content={"status": "loading"})
@@ -0,0 +1,112 @@
+"""Client for the sentiment backend's /predict endpoint.
+
+Review lists are split into chunks of `chunk_size` that are posted in parallel over one
+pooled keep-alive session, gzip compressed. A failed chunk (connection error, timeout,
+429 or 5xx) is retried with exponential backoff on its own, and results come back in the
+order of the input, so a long list costs about as much as its slowest chunk.
+"""
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+BACKEND_URL = os.getenv("BACKEND_URL", "https://hetbhalani-movie-sentiment-fastapi.hf.space/predict")
+#reviews per request and requests in flight at once
+BACKEND_CHUNK_SIZE = int(os.getenv("BACKEND_CHUNK_SIZE", "32"))
+BACKEND_PARALLELISM = int(os.getenv("BACKEND_PARALLELISM", "4"))
+
+#503 is also what the backend answers while its model is still loading
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header, which holds either seconds or an HTTP-date"""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class BackendClient:
+    def __init__(self, url=BACKEND_URL, chunk_size=BACKEND_CHUNK_SIZE, parallelism=BACKEND_PARALLELISM,
+                 retries=3, backoff=0.5, timeout=(10, 120), compress=True):
+        self.url = url
+        self.chunk_size = max(1, chunk_size)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.compress = compress
+        self.session = requests.Session()
+        #one keep-alive connection per parallel chunk instead of urllib3's default of 10
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, parallelism))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max(1, parallelism), thread_name_prefix="backend")
+        self._lock = threading.Lock()
+
+    def _body(self, reviews):
+        body = json.dumps({"reviews": reviews}).encode("utf-8")
+        if not self.compress:
+            return body, {"Content-Type": "application/json"}
+        #level 5 gets most of the size win of 9 at a fraction of the cpu
+        return gzip.compress(body, compresslevel=5), {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+    def _post(self, reviews):
+        """Sentiments for one chunk, retrying connection errors, timeouts, 429 and 5xx with backoff"""
+        for attempt in range(self.retries + 1):
+            compressed = self.compress
+            body, headers = self._body(reviews)
+            try:
+                response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+                if compressed and response.status_code in (400, 415, 422):
+                    #backends from before gzip support cannot read the body, send them plain JSON from now on
+                    with self._lock:
+                        self.compress = False
+                    body, headers = self._body(reviews)
+                    response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()["sentiments"]
+                #honoured, but never longer than our own backoff would ever wait
+                delay = min(retry_after_seconds(response.headers.get("Retry-After")), self.backoff * 2 ** self.retries)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                delay = 0
+            #full jitter so chunks that failed together do not retry together
+            time.sleep(max(delay, self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)))
+
+    def iter_chunks(self, reviews):
+        """Yield the sentiments chunk by chunk in input order while later chunks are still in flight"""
+        chunks = [reviews[i:i + self.chunk_size] for i in range(0, len(reviews), self.chunk_size)]
+        futures = [self._executor.submit(self._post, chunk) for chunk in chunks]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            #a failed chunk (or a caller that stopped reading) drops whatever has not started yet
+            for future in futures:
+                future.cancel()
+
+    def predict(self, reviews):
+        return [sentiment for chunk in self.iter_chunks(reviews) for sentiment in chunk]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,161 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+import torch
+
+#every backend turns the fp32 model into a `forward(**inputs) -> logits` callable
+BACKENDS = ("eager", "int8", "torchscript", "onnx")
+
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "onnx/model.onnx")
+
+#INFERENCE_BACKEND=stub loads no model at all, each batch just sleeps this long:
+#a fixed part plus a part per padded token (rows * longest row, words counted as tokens)
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "20"))
+STUB_MS_PER_TOKEN = float(os.getenv("STUB_MS_PER_TOKEN", "0"))
+
+
+class _LogitsOnly(torch.nn.Module):
+    #wraps the HF model so tracing/export sees plain tensors in and out
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+
+def _example_inputs(tokenizer):
+    encoded = tokenizer(["This movie was great!", "Not my kind of film at all, too long."],
+                        return_tensors="pt", padding=True)
+    return encoded["input_ids"], encoded["attention_mask"]
+
+
+def _eager(model, tokenizer):
+    def forward(**inputs):
+        return model(**inputs).logits
+    return forward
+
+
+def _int8(model, tokenizer):
+    #weights of every Linear layer stored as int8, activations quantized on the fly
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+
+    def forward(**inputs):
+        return quantized(**inputs).logits
+    return forward
+
+
+def _torchscript(model, tokenizer):
+    with torch.no_grad():
+        traced = torch.jit.trace(_LogitsOnly(model).eval(), _example_inputs(tokenizer))
+        traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+    def forward(input_ids, attention_mask, **_):
+        return traced(input_ids, attention_mask)
+    return forward
+
+
+def _onnx_source(model):
+    """Which model and revision an export comes from, stored next to the graph"""
+    revision = getattr(model.config, "_commit_hash", None)
+    path = model.name_or_path
+    if revision is None and path and os.path.isdir(path):
+        #a local checkpoint has no hub revision, rewriting its files makes it a new one
+        revision = max((os.path.getmtime(name) for name in glob.glob(os.path.join(path, "*"))), default=None)
+    return {"model": path, "revision": revision}
+
+
+def _exported_from(path):
+    try:
+        with open(f"{path}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _export_onnx(model, tokenizer, path):
+    """Export the model to `path` with dynamic batch and sequence axes, `path`.json says from what"""
+    target_dir = os.path.dirname(path) or "."
+    os.makedirs(target_dir, exist_ok=True)
+    #export into a private directory and move it over, worker processes may race to export
+    export_dir = tempfile.mkdtemp(prefix=".export-", dir=target_dir)
+    tmp_path = os.path.join(export_dir, os.path.basename(path))
+    dynamic = {0: "batch", 1: "sequence"}
+    try:
+        with torch.no_grad():
+            #dynamo=False: the dynamo exporter (the default from torch 2.9) needs onnxscript
+            torch.onnx.export(
+                _LogitsOnly(model).eval(),
+                _example_inputs(tokenizer),
+                tmp_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "logits": {0: "batch"}},
+                opset_version=14,
+                dynamo=False,
+            )
+        with open(f"{tmp_path}.json", "w", encoding="utf-8") as f:
+            json.dump(_onnx_source(model), f)
+        #models over 2GB keep their weights in files next to the graph, which refers to them
+        #by name: move those first, then the graph, and the source file last, as it is what
+        #marks the export as done
+        for name in os.listdir(export_dir):
+            if name not in (os.path.basename(tmp_path), os.path.basename(f"{tmp_path}.json")):
+                os.replace(os.path.join(export_dir, name), os.path.join(target_dir, name))
+        os.replace(tmp_path, path)
+        os.replace(f"{tmp_path}.json", f"{path}.json")
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+
+def _onnx(model, tokenizer):
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError("The onnx backend needs onnxruntime, install it with `pip install onnx onnxruntime`")
+
+    #export once, later starts reuse the file as long as it comes from this model and revision
+    if _exported_from(ONNX_MODEL_PATH) != _onnx_source(model):
+        if os.path.exists(ONNX_MODEL_PATH):
+            print(f"{ONNX_MODEL_PATH} was exported from another model or revision, exporting it again")
+        _export_onnx(model, tokenizer, ONNX_MODEL_PATH)
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = torch.get_num_threads()
+    session = onnxruntime.InferenceSession(ONNX_MODEL_PATH, options, providers=["CPUExecutionProvider"])
+
+    def forward(input_ids, attention_mask, **_):
+        outputs = session.run(["logits"], {
+            "input_ids": input_ids.cpu().numpy(),
+            "attention_mask": attention_mask.cpu().numpy(),
+        })
+        return torch.from_numpy(outputs[0])
+    return forward
+
+
+def stub_predict(texts, max_length=128, num_labels=3):
+    """Fake logits for load tests, the same label every time for the same text"""
+    longest = max((min(len(text.split()) + 2, max_length) for text in texts), default=0)
+    time.sleep((STUB_LATENCY_MS + STUB_MS_PER_TOKEN * len(texts) * longest) / 1000)
+    logits = torch.zeros(len(texts), num_labels)
+    for i, text in enumerate(texts):
+        logits[i, zlib.crc32(text.encode()) % num_labels] = 1.0
+    return logits
+
+
+def load_backend(name, model, tokenizer):
+    """Build the forward function for the backend called `name` (one of BACKENDS)"""
+    builders = {
+        "eager": _eager,
+        "int8": _int8,
+        "torchscript": _torchscript,
+        "onnx": _onnx,
+    }
+    if name not in builders:
+        raise ValueError(f"Unknown inference backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    return builders[name](model, tokenizer)
@@ -0,0 +1,179 @@
+"""Headless bulk analysis of many titles, e.g. the lists in scrapers/.
+
+    python batch.py --titles-file scrapers/movie_list_100.txt --out movies_summary.csv
+    python batch.py "The Shawshank Redemption" tt0068646
+
+Titles are scraped concurrently over plain HTTP, their reviews are pooled into large
+cross-title batches for the backend, and one summary row per title is written as CSV.
+Reviews and sentiments also go into the review store, so the Streamlit app finds them.
+"""
+import argparse
+import asyncio
+import csv
+import re
+import time
+import requests
+import imdb_fetch
+from backend_client import BACKEND_URL, BackendClient
+from review_store import ReviewStore, REVIEW_STORE_PATH
+from scoring import LABELS, star_score
+
+TITLE_ID_RE = re.compile(r"tt\d+")
+
+SUMMARY_FIELDS = ["title", "title_id", "reviews", *LABELS, "stars", "scrape_seconds", "score_seconds", "error"]
+
+
+def read_titles(paths, titles):
+    """Titles from the command line and from files with one title or IMDb ID per line"""
+    titles = list(titles)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            titles.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    #keep the first occurrence of each title, in order
+    return list(dict.fromkeys(titles))
+
+
+class Scorer:
+    """Collects reviews from every title and sends them to the backend in batches of `batch_size`.
+
+    Each batch is one gzip compressed request, retried on its own, see backend_client.py.
+    """
+
+    def __init__(self, backend_url, batch_size, store):
+        self.batch_size = batch_size
+        self.store = store
+        #a batch is already one cross-title request, the client must not split it up again
+        self.client = BackendClient(backend_url, chunk_size=batch_size, timeout=(10, 600))
+        self.pending = []
+
+    def add(self, row, texts):
+        row["_queued"] = time.perf_counter()
+        row["_remaining"] = len(texts)
+        if not texts:
+            self._finish(row)
+        self.pending.extend((row, text) for text in texts)
+
+    async def flush(self, partial=False):
+        while len(self.pending) >= self.batch_size or (partial and self.pending):
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            try:
+                sentiments = await asyncio.to_thread(self.client.predict, [text for _, text in batch])
+            except (requests.RequestException, ValueError) as e:
+                print(f"Scoring batch of {len(batch)} failed: {e}")
+                sentiments = [None] * len(batch)
+            for (row, text), sentiment in zip(batch, sentiments):
+                if sentiment is None:
+                    row["error"] = row["error"] or "scoring failed"
+                else:
+                    row[sentiment] += 1
+                    row["_scored"][text] = sentiment
+                row["_remaining"] -= 1
+                if row["_remaining"] == 0:
+                    self._finish(row)
+
+    def _finish(self, row):
+        row["score_seconds"] = round(time.perf_counter() - row["_queued"], 2)
+        row["stars"] = star_score({label: row[label] for label in LABELS})
+        if self.store is not None and row["_scored"]:
+            self.store.save_sentiments(row["title_id"], row["_scored"])
+        print(f"{row['title']}: {row['reviews']} reviews, stars {row['stars']}")
+
+
+async def scrape(fetcher, store, title, target):
+    """Title ID and up to `target` review texts, plus the ones already scored in the store"""
+    movie_id = title if TITLE_ID_RE.fullmatch(title) else None
+    if movie_id is None and store is not None:
+        movie_id = store.get_title_id(title)
+    if movie_id is None:
+        movie_id = await fetcher.fetch_title_id(title)
+        if movie_id is None:
+            raise LookupError("title not found")
+        if store is not None:
+            store.put_title_id(title, movie_id)
+
+    if store is None:
+        reviews = [review["text"] for review in await fetcher.fetch_reviews_paginated(movie_id, target)]
+        return movie_id, reviews or await fetcher.fetch_reviews(movie_id), {}
+
+    known = store.known_review_ids(movie_id)
+    store.add_reviews(movie_id, await fetcher.fetch_reviews_paginated(movie_id, target, known))
+    stored = store.get_reviews(movie_id, limit=target)
+    if not stored:
+        #no pagination data on the page, score what the reviews page shows without storing it
+        return movie_id, await fetcher.fetch_reviews(movie_id), {}
+    return movie_id, [review["text"] for review in stored], store.stored_sentiments(movie_id)
+
+
+async def run_batch(titles, args):
+    store = None if args.no_store else ReviewStore(args.store)
+    fetcher = imdb_fetch.Fetcher(per_host_limit=args.workers, per_host_rate=args.rate)
+    scorer = Scorer(args.backend, args.batch_size, store)
+    workers = asyncio.Semaphore(args.workers)
+    rows = [{"title": title, "title_id": title if TITLE_ID_RE.fullmatch(title) else None, "reviews": 0,
+             **{label: 0 for label in LABELS}, "stars": None, "scrape_seconds": None, "score_seconds": None,
+             "error": None, "_scored": {}} for title in titles]
+
+    async def analyze(row):
+        async with workers:
+            start = time.perf_counter()
+            try:
+                row["title_id"], reviews, scored = await scrape(fetcher, store, row["title"], args.target)
+            except Exception as e:
+                row["error"] = (str(e) or type(e).__name__).splitlines()[0]
+                print(f"{row['title']}: {row['error']}")
+                return
+            finally:
+                row["scrape_seconds"] = round(time.perf_counter() - start, 2)
+        row["reviews"] = len(reviews)
+        #reviews scored on an earlier run are counted without asking the backend again
+        for text in reviews:
+            if text in scored:
+                row[scored[text]] += 1
+        scorer.add(row, [text for text in reviews if text not in scored])
+        await scorer.flush()
+
+    try:
+        await asyncio.gather(*(analyze(row) for row in rows))
+        await scorer.flush(partial=True)
+    finally:
+        await fetcher.aclose()
+        if store is not None:
+            store.close()
+    return rows
+
+
+def write_summary(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape and score many titles, one summary row per title")
+    parser.add_argument("titles", nargs="*", help="movie names or IMDb IDs (tt...)")
+    parser.add_argument("--titles-file", action="append", default=[], help="file with one title or ID per line")
+    parser.add_argument("--out", default="batch_summary.csv")
+    parser.add_argument("--backend", default=BACKEND_URL, help="the backend's /predict URL")
+    parser.add_argument("--target", type=int, default=100, help="reviews per title")
+    parser.add_argument("--workers", type=int, default=8, help="titles scraped at the same time")
+    parser.add_argument("--rate", type=float, default=imdb_fetch.IMDB_RATE_LIMIT or 5,
+                        help="IMDb requests per second (0 for no limit)")
+    parser.add_argument("--batch-size", type=int, default=256, help="reviews per backend request, across titles")
+    parser.add_argument("--store", default=REVIEW_STORE_PATH)
+    parser.add_argument("--no-store", action="store_true", help="do not read or write the review store")
+    args = parser.parse_args()
+
+    titles = read_titles(args.titles_file, args.titles)
+    if not titles:
+        parser.error("no titles given")
+
+    start = time.perf_counter()
+    rows = asyncio.run(run_batch(titles, args))
+    write_summary(rows, args.out)
+    failed = sum(1 for row in rows if row["error"])
+    print(f"{len(rows)} titles in {time.perf_counter() - start:.1f}s, {failed} failed, summary in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import metrics
+
+BATCH_SIZE = metrics.REGISTRY.histogram("cinesense_batch_size", "Reviews per micro-batch",
+                                        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+
+
+class MicroBatcher:
+    """Collects reviews from concurrent requests and runs them through the model in one call.
+
+    A batch is closed once it holds at least `max_batch_size` texts or `max_wait` seconds
+    have passed since its first request arrived. Requests are never split, so a single
+    large request can make a batch bigger than `max_batch_size`. With `num_workers` > 1
+    that many batches can be in flight at once, for a `predict_fn` that fans out to
+    several model copies.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait=0.01, num_workers=1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"micro-batcher-{i}", daemon=True)
+            for i in range(max(1, num_workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, texts):
+        """Queue a list of texts, returns a Future resolving to their rows of logits"""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        #the caller's timing breakdown, if any, also gets the stages of the batch it lands in
+        self._queue.put((list(texts), future, metrics.current_timings(), time.perf_counter()))
+        return future
+
+    def predict(self, texts):
+        return self.submit(texts).result()
+
+    def close(self):
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _collect(self):
+        #block for the first request, then keep filling until size or time runs out
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            size += len(item[0])
+        return batch, False
+
+    def _loop(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if batch:
+                self._run(batch)
+
+    def _run(self, batch):
+        #skip requests whose caller already gave up
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        for _, _, timings, submitted in batch:
+            metrics.record("queue_wait", started - submitted, timings)
+
+        texts = [text for item in batch for text in item[0]]
+        BATCH_SIZE.observe(len(texts))
+        try:
+            with metrics.collect_timings() as batch_timings:
+                logits = self.predict_fn(texts)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                future.set_exception(e)
+            return
+
+        for _, _, timings, _ in batch:
+            if timings is not None:
+                metrics.merge_timings(timings, batch_timings)
+
+        #route each slice of logits back to the request it came from
+        start = 0
+        for item_texts, future, _, _ in batch:
+            end = start + len(item_texts)
+            future.set_result(logits[start:end])
+            start = end
@@ -0,0 +1,215 @@
+"""Accuracy and speed of the served prediction path over a grid of settings.
+
+Runs the same code as app.py (backends.load_backend + inference.predict_logits with
+length bucketing) over a labeled CSV. For every combination of backend, request batch
+size, max length, window stride and thread count it reports accuracy, macro/weighted F1, reviews per
+second, p50/p95/p99 latency per request and peak RSS. Run from the repo root:
+
+    python benchmarks/bench_model.py --csv final.csv --batch-sizes 1 8 32 --max-lengths 128 256 --out new.json
+    python benchmarks/bench_model.py --csv final.csv --compare old.json
+
+Labels come from the label column, or from the rating column with the dataset.py mapping.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+import torch
+from transformers import RobertaForSequenceClassification, RobertaTokenizer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backends import BACKENDS, load_backend
+from dataset import rating_to_label
+from inference import predict_logits, predict_logits_windowed
+from scoring import LABELS
+
+
+class PeakRss:
+    """Highest resident set size while the block runs, sampled from /proc every few ms"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _rss(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            #no /proc, fall back to the peak of the whole process (KB on Linux)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def f1_scores(labels, preds, num_classes=len(LABELS)):
+    """Macro and support-weighted F1 over the classes"""
+    confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+    np.add.at(confusion, (labels, preds), 1)
+    tp = np.diag(confusion)
+    precision = np.divide(tp, confusion.sum(0), out=np.zeros(num_classes), where=confusion.sum(0) > 0)
+    recall = np.divide(tp, confusion.sum(1), out=np.zeros(num_classes), where=confusion.sum(1) > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(num_classes),
+                   where=(precision + recall) > 0)
+    support = confusion.sum(1)
+    return float(f1.mean()), float((f1 * support).sum() / max(support.sum(), 1))
+
+
+def load_reviews(path, limit=0):
+    df = pd.read_csv(path).dropna(subset=["review"])
+    if limit:
+        df = df.head(limit)
+    if "label" in df.columns:
+        labels = df["label"].to_numpy(dtype=np.int64)
+    else:
+        labels = rating_to_label(df["rating"]).astype(np.int64)
+    return df["review"].astype(str).tolist(), labels
+
+
+def run_config(forward, tokenizer, texts, labels, batch_size, max_length, token_budget, window_stride=0):
+    """One pass over the texts in requests of `batch_size` reviews, sliding windows when `window_stride` > 0"""
+    def predict(batch):
+        if window_stride:
+            return predict_logits_windowed(forward, tokenizer, batch, max_length=max_length, stride=window_stride,
+                                           token_budget=token_budget)
+        return predict_logits(forward, tokenizer, batch, max_length=max_length, token_budget=token_budget)
+
+    #first request pays one-off allocation and graph costs, keep it out of the numbers
+    predict(texts[:batch_size])
+
+    preds, latencies = [], []
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            request_start = time.perf_counter()
+            logits = predict(texts[i:i + batch_size])
+            latencies.append(time.perf_counter() - request_start)
+            preds.extend(logits.argmax(-1).tolist())
+        seconds = time.perf_counter() - start
+
+    preds = np.asarray(preds)
+    macro_f1, weighted_f1 = f1_scores(labels, preds)
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {
+        "accuracy": round(float((preds == labels).mean()), 4),
+        "macro_f1": round(macro_f1, 4),
+        "weighted_f1": round(weighted_f1, 4),
+        "reviews_per_second": round(len(texts) / seconds, 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        "seconds": round(seconds, 2),
+    }
+
+
+def config_key(result):
+    return (result["backend"], result["batch_size"], result["max_length"], result.get("window_stride", 0),
+            result["threads"])
+
+
+def compare(results, baseline_path, csv, reviews):
+    with open(baseline_path) as f:
+        data = json.load(f)
+    baseline = {config_key(result): result for result in data["results"]}
+    print(f"\nAgainst {baseline_path}:")
+    if (data["csv"], data["reviews"]) != (csv, reviews):
+        print(f"Warning: the baseline ran on {data['reviews']} reviews from {data['csv']}")
+    print(f"{'backend':<12} {'batch':>5} {'len':>5} {'win':>4} {'thr':>4} {'accuracy':>10} {'macro f1':>10} "
+          f"{'reviews/s':>10} {'p95 ms':>9}")
+    for result in results:
+        old = baseline.get(config_key(result))
+        if old is None:
+            continue
+        print(f"{result['backend']:<12} {result['batch_size']:>5} {result['max_length']:>5} "
+              f"{result['window_stride']:>4} {result['threads']:>4} {result['accuracy'] - old['accuracy']:>+10.4f} {result['macro_f1'] - old['macro_f1']:>+10.4f} "
+              f"{result['reviews_per_second'] / old['reviews_per_second'] - 1:>+10.1%} "
+              f"{result['p95_ms'] / old['p95_ms'] - 1:>+9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "hetbhalani/roberta-enhanced-for-sentiment"))
+    parser.add_argument("--csv", default="final.csv", help="reviews with a label or rating column")
+    parser.add_argument("--limit", type=int, default=0, help="only use the first N reviews")
+    parser.add_argument("--backends", nargs="+", default=["eager"], choices=BACKENDS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32], help="reviews per request")
+    parser.add_argument("--max-lengths", nargs="+", type=int, default=[128])
+    parser.add_argument("--window-strides", nargs="+", type=int, default=[0],
+                        help="0 truncates at the max length, N > 0 scores sliding windows N tokens apart")
+    parser.add_argument("--threads", nargs="+", type=int, default=[torch.get_num_threads()])
+    parser.add_argument("--token-budget", type=int, default=4096, help="same as TOKEN_BUDGET in app.py")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier run to print the differences against")
+    args = parser.parse_args()
+
+    texts, labels = load_reviews(args.csv, args.limit)
+    model = RobertaForSequenceClassification.from_pretrained(args.model)
+    model.eval()
+    tokenizer = RobertaTokenizer.from_pretrained(args.model)
+
+    print(f"{len(texts)} reviews from {args.csv}")
+    print(f"{'backend':<12} {'batch':>5} {'len':>5} {'win':>4} {'thr':>4} {'accuracy':>9} {'macro f1':>9} "
+          f"{'reviews/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rss MB':>8}")
+    results = []
+    for backend in args.backends:
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            #built per thread count, onnxruntime fixes its thread count when the session is created
+            forward = load_backend(backend, model, tokenizer)
+            for max_length, window_stride in itertools.product(args.max_lengths, args.window_strides):
+                for batch_size in args.batch_sizes:
+                    result = {"backend": backend, "batch_size": batch_size, "max_length": max_length,
+                              "window_stride": window_stride, "threads": threads}
+                    result.update(run_config(forward, tokenizer, texts, labels, batch_size, max_length,
+                                             args.token_budget, window_stride))
+                    results.append(result)
+                    print(f"{backend:<12} {batch_size:>5} {max_length:>5} {window_stride:>4} {threads:>4} "
+                          f"{result['accuracy']:>9.2%} {result['macro_f1']:>9.4f} {result['reviews_per_second']:>10.1f} "
+                          f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                          f"{result['peak_rss_mb']:>8.0f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "model": args.model,
+                "csv": args.csv,
+                "reviews": len(texts),
+                "token_budget": args.token_budget,
+                "torch": torch.__version__,
+                "cpu_count": os.cpu_count(),
+                "platform": platform.platform(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.out}")
+
+    if args.compare:
+        compare(results, args.compare, args.csv, len(texts))
+
+
+if __name__ == "__main__":
+    torch.set_grad_enabled(False)
+    main()
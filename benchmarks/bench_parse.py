@@ -0,0 +1,137 @@
+"""Benchmark IMDb page parsing: the old BeautifulSoup selectors against extract.py.
+
+Save some IMDb pages (reviews pages after "Show All" are the interesting ones) as .html
+files in a directory and run from the repo root:
+
+    python benchmarks/bench_parse.py --pages saved_pages/
+    python benchmarks/bench_parse.py --synthetic 600   # no saved pages, generated markup
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import extract
+
+
+#the selectors main.py and imdb_fetch.py used before extract.py, tried one by one
+LEGACY_TITLE_LINK_SELECTORS = [
+    "a.ipc-metadata-list-summary-item__t",
+    "a[href*='/title/tt']",
+    ".findResult .result_text a"
+]
+LEGACY_POSTER_SELECTORS = [
+    "img.ipc-image",
+    "img[class*='poster']",
+    "div.ipc-media img",
+    "img.ipc-lockup-overlay__screen",
+    "div.ipc-poster img",
+    ".poster img",
+    "[data-testid='hero-media__poster'] img"
+]
+LEGACY_REVIEW_SELECTORS = [
+    "div.ipc-html-content-inner-div",
+    "div.content .text",
+    "div[data-testid='review-content']",
+    ".review-container .content",
+    "div.text.show-more__control"
+]
+
+
+def legacy_extract(page):
+    #the old code parsed each page once, for the one field that page was fetched for, so all
+    #three fields come from one html.parser tree here, the same one parse extract.extract does
+    soup = BeautifulSoup(page, "html.parser")
+    title_id = None
+    for selector in LEGACY_TITLE_LINK_SELECTORS:
+        tag = soup.select_one(selector)
+        if tag:
+            title_id = tag['href'].split('/')[2]
+            break
+
+    poster_url = None
+    for selector in LEGACY_POSTER_SELECTORS:
+        tag = soup.select_one(selector)
+        if tag and tag.get('src'):
+            poster_url = tag['src']
+            break
+
+    reviews = []
+    for selector in LEGACY_REVIEW_SELECTORS:
+        elements = soup.select(selector)
+        if elements:
+            for element in elements:
+                text = element.get_text(strip=True)
+                if text and len(text) > 20:
+                    reviews.append(text)
+            break
+
+    return {"title_id": title_id, "poster_url": poster_url, "reviews": reviews}
+
+
+def synthetic_page(num_reviews):
+    body = "The pacing drags in the middle act,<br/>but the ending <i>really</i> lands. " * 4
+    cards = "".join(
+        '<article class="user-review-item"><div class="ipc-list-card__content">'
+        f'<span class="ipc-rating-star--rating">{i % 10 + 1}</span>'
+        '<div class="ipc-html-content ipc-html-content--base">'
+        f'<div class="ipc-html-content-inner-div">Review {i}: {body}</div>'
+        '</div></div></article>'
+        for i in range(num_reviews)
+    )
+    return (
+        '<html><head><link rel="canonical" href="https://www.imdb.com/title/tt0111161/reviews/"></head><body>'
+        '<div class="ipc-poster"><img class="ipc-image" src="https://m.media-amazon.com/images/poster.jpg"></div>'
+        f'<a class="ipc-metadata-list-summary-item__t" href="/title/tt0111161/?ref_=fn_al_tt_1">Title</a>{cards}'
+        '</body></html>'
+    )
+
+
+def time_it(fn, page, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(page)
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", help="directory of saved IMDb .html pages")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate a reviews page with N reviews")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = []
+    if args.pages:
+        for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append((os.path.basename(path), f.read()))
+    if args.synthetic:
+        pages.append((f"synthetic-{args.synthetic}", synthetic_page(args.synthetic)))
+    if not pages:
+        parser.error("give --pages and/or --synthetic")
+
+    print(f"{'page':<32} {'KB':>7} {'reviews':>8} {'legacy ms':>10} {'lxml ms':>8} {'speedup':>8}  same")
+    total_legacy = total_fast = 0
+    for name, page in pages:
+        legacy, legacy_ms = time_it(legacy_extract, page, args.repeat)
+        fast, fast_ms = time_it(extract.extract, page, args.repeat)
+        total_legacy += legacy_ms
+        total_fast += fast_ms
+        #extract.py also reads the canonical link, so it can find a title ID where the old code found none
+        same = (legacy["reviews"] == fast["reviews"] and legacy["poster_url"] == fast["poster_url"]
+                and legacy["title_id"] in (None, fast["title_id"]))
+        print(f"{name[:32]:<32} {len(page) / 1024:>7.0f} {len(fast['reviews']):>8} "
+              f"{legacy_ms:>10.1f} {fast_ms:>8.1f} {legacy_ms / fast_ms:>7.1f}x  {'yes' if same else 'NO'}")
+
+    print(f"{'total':<32} {'':>7} {'':>8} {total_legacy:>10.1f} {total_fast:>8.1f} {total_legacy / total_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Load test the FastAPI backend with review lists sampled from final.csv.
+
+Closed loop (a fixed number of clients sending back to back) or open loop (Poisson
+arrivals at a fixed request rate), one step per value so the saturation point shows up
+as the step where throughput stops growing and latency takes off:
+
+    python benchmarks/loadtest.py --url http://localhost:8000 --concurrency 1 4 16 64
+    python benchmarks/loadtest.py --url http://localhost:8000 --rates 5 10 20 40 --duration 30
+
+--spawn-stub starts app.py with INFERENCE_BACKEND=stub on a free port, so the web,
+queueing and serialization overhead is measured without RoBERTa:
+
+    python benchmarks/loadtest.py --spawn-stub --stub-latency-ms 20 --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+import httpx
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_range(value):
+    """'20' or '5-50' -> (low, high)"""
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+class Workload:
+    """Random review lists like the Streamlit app sends, one title's worth per request"""
+
+    def __init__(self, csv, reviews_per_request, unique=False, seed=0):
+        self.reviews = pd.read_csv(csv)["review"].dropna().astype(str).tolist()
+        self.low, self.high = reviews_per_request
+        self.unique = unique
+        self.random = random.Random(seed)
+
+    def body(self):
+        reviews = self.random.sample(self.reviews, min(self.random.randint(self.low, self.high), len(self.reviews)))
+        if self.unique:
+            #defeat the prediction cache so every review reaches the model
+            reviews = [f"{review} {uuid.uuid4().hex}" for review in reviews]
+        return {"reviews": reviews}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = {}
+        self.reviews = 0
+
+    def record(self, latency, reviews, error=None):
+        if error is None:
+            self.latencies.append(latency)
+            self.reviews += reviews
+        else:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, seconds):
+        ok = len(self.latencies)
+        failed = sum(self.errors.values())
+        latencies = np.asarray(self.latencies or [float("nan")]) * 1000
+        p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+        return {
+            "requests": ok + failed,
+            "ok": ok,
+            "error_rate": round(failed / max(ok + failed, 1), 4),
+            "errors": self.errors,
+            "requests_per_second": round(ok / seconds, 2),
+            "reviews_per_second": round(self.reviews / seconds, 2),
+            "p50_ms": round(float(p50), 1),
+            "p90_ms": round(float(p90), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1),
+            "max_ms": round(float(np.max(latencies)), 1),
+        }
+
+
+async def send(client, url, workload, stats, timeout):
+    body = workload.body()
+    start = time.perf_counter()
+    try:
+        response = await client.post(url, json=body, timeout=timeout)
+        error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    stats.record(time.perf_counter() - start, len(body["reviews"]), error)
+
+
+async def closed_loop(client, url, workload, concurrency, duration, timeout):
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await send(client, url, workload, stats, timeout)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return stats
+
+
+async def open_loop(client, url, workload, rate, duration, timeout, max_in_flight):
+    #arrivals do not wait for responses, so a slow server builds a queue like real traffic would
+    stats = Stats()
+    tasks = set()
+    deadline = time.perf_counter() + duration
+    arrival_rng = random.Random(1)
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(arrival_rng.expovariate(rate))
+        if len(tasks) >= max_in_flight:
+            stats.record(0, 0, "client queue full")
+            continue
+        task = asyncio.ensure_future(send(client, url, workload, stats, timeout))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return stats
+
+
+async def wait_ready(client, base_url, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base_url}/readyz")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"{base_url} did not become ready")
+
+
+async def run(args):
+    workload = Workload(args.csv, parse_range(args.reviews_per_request), args.unique)
+    url = args.url.rstrip("/") + args.endpoint
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    steps = [("rate", rate) for rate in args.rates] or [("concurrency", n) for n in args.concurrency]
+
+    async with httpx.AsyncClient(limits=limits) as client:
+        await wait_ready(client, args.url.rstrip("/"))
+        if args.warmup:
+            await closed_loop(client, url, workload, 1, args.warmup, args.timeout)
+
+        print(f"{'mode':<12} {'value':>6} {'req/s':>8} {'reviews/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+        results = []
+        for mode, value in steps:
+            start = time.perf_counter()
+            if mode == "rate":
+                stats = await open_loop(client, url, workload, value, args.duration, args.timeout, args.max_in_flight)
+            else:
+                stats = await closed_loop(client, url, workload, value, args.duration, args.timeout)
+            result = {"mode": mode, "value": value, **stats.summary(time.perf_counter() - start)}
+            results.append(result)
+            print(f"{mode:<12} {value:>6g} {result['requests_per_second']:>8.1f} {result['reviews_per_second']:>10.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{result['max_ms']:>8.1f} {result['error_rate']:>7.1%}")
+            for error, count in result["errors"].items():
+                print(f"    {count} x {error}")
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_stub(args):
+    port = free_port()
+    env = dict(os.environ, INFERENCE_BACKEND="stub", STUB_LATENCY_MS=str(args.stub_latency_ms),
+               STUB_MS_PER_TOKEN=str(args.stub_ms_per_token))
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=ROOT, env=env)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000", help="backend base URL")
+    parser.add_argument("--endpoint", default="/predict", help="/predict or /predict/aggregate")
+    parser.add_argument("--csv", default=os.path.join(ROOT, "final.csv"))
+    parser.add_argument("--reviews-per-request", default="20-100", help="N or LOW-HIGH reviews per request")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16], help="closed loop clients")
+    parser.add_argument("--rates", nargs="+", type=float, default=[], help="open loop requests per second")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per step")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of traffic before the first step")
+    parser.add_argument("--timeout", type=float, default=60, help="per request timeout in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open requests allowed at once")
+    parser.add_argument("--unique", action="store_true", help="make every review unique to bypass the cache")
+    parser.add_argument("--spawn-stub", action="store_true", help="start app.py with the stub model and test it")
+    parser.add_argument("--stub-latency-ms", type=float, default=20)
+    parser.add_argument("--stub-ms-per-token", type=float, default=0)
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    process = None
+    if args.spawn_stub:
+        process, args.url = spawn_stub(args)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"url": args.url, "endpoint": args.endpoint, "reviews_per_request": args.reviews_per_request,
+                       "unique": args.unique, "stub": args.spawn_stub, "results": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Build the training data as one columnar dataset instead of the JSON dumps and CSV copies.
+
+    python dataset.py scrapers/corpus scrapers/final_data.json final.csv --out data/reviews
+
+Inputs are crawler shard directories or .jsonl files, the notebook's {title_id: [reviews]}
+JSON dumps and CSVs with a review column plus a rating or label. They are read in chunks,
+and every derived column (label, clean text, text hash, split) is computed per chunk with
+vectorized pandas/numpy operations. The result is a Parquet (or Arrow IPC) dataset
+partitioned by split=train/test, deduplicated on the review text.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+DATASET_PATH = os.getenv("DATASET_PATH", "data/reviews")
+
+SCHEMA = pa.schema([
+    ("text", pa.string()),
+    ("clean_text", pa.string()),
+    ("rating", pa.int8()),
+    ("label", pa.int8()),
+    ("title_id", pa.string()),
+    ("text_hash", pa.uint64()),
+    ("split", pa.string()),
+])
+
+#english stopwords, contractions included since they are removed before apostrophes
+STOPWORDS = """
+i me my myself we our ours ourselves you your yours yourself yourselves he him his himself she her hers
+herself it its itself they them their theirs themselves what which who whom this that these those am is
+are was were be been being have has had having do does did doing a an the and but if or because as until
+while of at by for with about against between into through during before after above below to from up
+down in out on off over under again further then once here there when where why how all any both each few
+more most other some such no nor not only own same so than too very s t can will just don should now d ll
+m o re ve y ain aren couldn didn doesn hadn hasn haven isn ma mightn mustn needn shan shouldn wasn weren
+won wouldn i'm i've i'd i'll you're you've you'd you'll he's she's it's we're we've we'd we'll they're
+they've they'd they'll that's there's what's let's don't doesn't didn't isn't aren't wasn't weren't
+haven't hasn't hadn't won't wouldn't can't couldn't shouldn't mightn't mustn't needn't
+""".split()
+
+_STOPWORDS_RE = r"\b(?:" + "|".join(re.escape(word) for word in sorted(STOPWORDS, key=len, reverse=True)) + r")\b"
+
+
+def rating_to_label(ratings):
+    """0 Negative for 1-4 stars, 2 Positive for 8-10, 1 Neutral for 5-7 and for missing ratings"""
+    ratings = pd.to_numeric(ratings, errors="coerce").to_numpy(dtype="float64")
+    return np.select([ratings <= 4, ratings >= 8], [0, 2], default=1).astype("int8")
+
+
+def clean_text(texts):
+    """Lowercase, drop stopwords, keep letters only.
+
+    Normalized differently from cleaned_sentiment_dataset.csv, whose text was also
+    lemmatized ("movies" -> "movie") with a slightly different stopword list, so only
+    about 2% of its rows come out identical. Clean the raw reviews with this function
+    rather than comparing against that file.
+    """
+    return (texts.str.lower()
+            .str.replace("’", "'", regex=False)
+            .str.replace(r"[^a-z\s']", "", regex=True)
+            .str.replace(_STOPWORDS_RE, " ", regex=True)
+            .str.replace("'", "", regex=False)
+            .str.split().str.join(" "))
+
+
+def text_hash(texts):
+    return pd.util.hash_pandas_object(texts, index=False).to_numpy(dtype="uint64")
+
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk)
+
+
+def read_chunks(path, chunk_size=10000):
+    """DataFrames of text, rating, title_id and maybe label from one input, `chunk_size` rows at a time"""
+    if os.path.isdir(path):
+        #a crawler output directory, checkpoint.jsonl next to the shards is not data
+        for shard in sorted(glob.glob(os.path.join(path, "reviews-*.jsonl"))):
+            yield from read_chunks(shard, chunk_size)
+        return
+
+    if path.endswith(".jsonl"):
+        def records():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    yield {"text": record["review"], "rating": record.get("rating"),
+                           "title_id": record.get("title_id")}
+        yield from _chunks(records(), chunk_size)
+
+    elif path.endswith(".json"):
+        #the notebook dumps are one pretty-printed object, so this format is read whole once
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        records = ({"text": review["review"], "rating": review.get("rating"), "title_id": title_id}
+                   for title_id, reviews in data.items() for review in reviews)
+        yield from _chunks(records, chunk_size)
+
+    elif path.endswith(".csv"):
+        for chunk in pd.read_csv(path, chunksize=chunk_size):
+            chunk = chunk.rename(columns={"review": "text"})
+            chunk["title_id"] = chunk["title_id"] if "title_id" in chunk else None
+            yield chunk
+
+    else:
+        raise ValueError(f"Unknown input format: {path}")
+
+
+def prepare(chunk, seen, test_fraction=0.2):
+    """Add the derived columns, drop empty reviews and texts already in `seen`"""
+    chunk = chunk[chunk["text"].notna()]
+    chunk = chunk.assign(text=chunk["text"].astype(str).str.strip())
+    chunk = chunk[chunk["text"] != ""]
+
+    hashes = text_hash(chunk["text"])
+    #first occurrence wins, within the chunk and across everything written before
+    keep = ~pd.Series(hashes).duplicated().to_numpy()
+    keep &= np.fromiter((h not in seen for h in hashes.tolist()), bool, len(hashes))
+    chunk, hashes = chunk[keep], hashes[keep]
+    seen.update(hashes.tolist())
+
+    if "rating" in chunk:
+        ratings = pd.to_numeric(chunk["rating"], errors="coerce")
+    else:
+        ratings = pd.Series(np.nan, index=chunk.index)
+    labels = rating_to_label(ratings)
+    if "label" in chunk:
+        #labeled CSVs without ratings keep their label
+        given = pd.to_numeric(chunk["label"], errors="coerce").fillna(1)
+        labels = np.where(ratings.isna(), given, labels).astype("int8")
+
+    return pa.table({
+        "text": pa.array(chunk["text"], pa.string()),
+        "clean_text": pa.array(clean_text(chunk["text"]), pa.string()),
+        "rating": pa.array(ratings.astype("Int8"), pa.int8()),
+        "label": pa.array(labels, pa.int8()),
+        "title_id": pa.array(chunk["title_id"].where(chunk["title_id"].notna(), None), pa.string()),
+        "text_hash": pa.array(hashes, pa.uint64()),
+        #split on the text hash, so the same review always lands in the same split
+        "split": pa.array(np.where(hashes % 1000 < test_fraction * 1000, "test", "train"), pa.string()),
+    }, schema=SCHEMA)
+
+
+def build(paths, out=DATASET_PATH, chunk_size=10000, test_fraction=0.2, file_format="parquet"):
+    seen = set()
+    written = {"rows": 0}
+
+    def batches():
+        for path in paths:
+            for chunk in read_chunks(path, chunk_size):
+                table = prepare(chunk, seen, test_fraction)
+                written["rows"] += table.num_rows
+                yield from table.to_batches()
+
+    ds.write_dataset(batches(), out, schema=SCHEMA, format=file_format, partitioning=["split"],
+                     partitioning_flavor="hive", existing_data_behavior="delete_matching")
+    return written["rows"]
+
+
+def load(path=DATASET_PATH, split=None, columns=None, file_format="parquet"):
+    """The dataset (or one split of it) as an Arrow table, Arrow IPC files are memory-mapped"""
+    dataset = ds.dataset(path, format=file_format, partitioning="hive",
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    return dataset.to_table(columns=columns, filter=None if split is None else ds.field("split") == split)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the partitioned training dataset from scraped reviews")
+    parser.add_argument("inputs", nargs="+", help="crawler shard directories, .jsonl, .json or .csv files")
+    parser.add_argument("--out", default=DATASET_PATH)
+    parser.add_argument("--format", default="parquet", choices=["parquet", "arrow"],
+                        help="arrow writes uncompressed IPC files that can be memory-mapped")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows processed at a time")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rows = build(args.inputs, args.out, args.chunk_size, args.test_fraction, args.format)
+    counts = load(args.out, columns=["split"], file_format=args.format)["split"].value_counts().to_pylist()
+    print(f"{rows} reviews written to {args.out}: " + ", ".join(f"{c['values']} {c['counts']}" for c in counts))
+
+
+if __name__ == "__main__":
+    main()
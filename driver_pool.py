@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+
+
+class DriverPool:
+    """Bounded pool of warm WebDriver instances shared by all Streamlit sessions.
+
+    `checkout` hands out an idle browser, starts a new one while the pool is below `size`,
+    or waits in FIFO order for one to be checked back in. Browsers are health-checked on
+    checkout and recycled after `max_pages` page loads or when they are returned broken.
+    """
+
+    def __init__(self, factory, size=2, max_pages=50):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self._idle = []
+        self._pages = {}
+        self._created = 0
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    def warm(self, count=1):
+        """Start up to `count` browsers in the background so the first search finds one ready"""
+        def start():
+            try:
+                driver = self.checkout(timeout=0)
+            except Exception as e:
+                print(f"Could not pre-start browser: {e}")
+                return
+            self.checkin(driver, used=False)
+
+        for _ in range(min(count, self.size)):
+            threading.Thread(target=start, name="driver-warmup", daemon=True).start()
+
+    def checkout(self, timeout=60):
+        ticket = object()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    #only the session at the head of the queue may take a browser
+                    if self._waiters[0] is ticket:
+                        if self._idle:
+                            driver = self._idle.pop()
+                            break
+                        if self._created < self.size:
+                            self._created += 1
+                            driver = None
+                            break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No browser became free in time")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+        if driver is not None and self._healthy(driver):
+            return driver
+        if driver is not None:
+            self._discard(driver, release=False)
+        return self._start()
+
+    def checkin(self, driver, broken=False, used=True):
+        if used:
+            self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+        if broken or self._pages.get(id(driver), 0) >= self.max_pages or not self._reset(driver):
+            self._discard(driver)
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+    def _start(self):
+        #the slot is already reserved, give it back if the browser fails to start
+        try:
+            driver = self.factory()
+            if driver is None:
+                raise RuntimeError("Could not initialize Chrome driver")
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify_all()
+            raise
+        self._pages[id(driver)] = 0
+        return driver
+
+    def _healthy(self, driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, driver):
+        #leave nothing from the last search behind for the next session
+        try:
+            driver.delete_all_cookies()
+            driver.get("about:blank")
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, driver, release=True):
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        if release:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify_all()
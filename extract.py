@@ -0,0 +1,85 @@
+"""Fast IMDb page extraction with lxml.
+
+Each page is parsed once and every field is pulled from that one tree with XPath
+expressions compiled at import time, instead of building a BeautifulSoup tree per field
+and running the CSS selectors one by one.
+"""
+from lxml import etree, html as lxml_html
+
+
+def _cls(name):
+    #XPath for "has this class", the same match as a CSS .class selector
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+#same selectors (and order) as the old BeautifulSoup code, written as XPath
+TITLE_LINK_XPATHS = [
+    f"//a[{_cls('ipc-metadata-list-summary-item__t')}]/@href",
+    "//a[contains(@href, '/title/tt')]/@href",
+    f"//*[{_cls('findResult')}]//*[{_cls('result_text')}]//a/@href",
+    #on a title or reviews page the page itself says which title it is
+    "//link[@rel='canonical']/@href",
+]
+
+POSTER_XPATHS = [
+    f"//img[{_cls('ipc-image')}]/@src",
+    "//img[contains(@class, 'poster')]/@src",
+    f"//div[{_cls('ipc-media')}]//img/@src",
+    f"//img[{_cls('ipc-lockup-overlay__screen')}]/@src",
+    f"//div[{_cls('ipc-poster')}]//img/@src",
+    f"//*[{_cls('poster')}]//img/@src",
+    "//*[@data-testid='hero-media__poster']//img/@src",
+]
+
+REVIEW_XPATHS = [
+    f"//div[{_cls('ipc-html-content-inner-div')}]",
+    f"//div[{_cls('content')}]//*[{_cls('text')}]",
+    "//div[@data-testid='review-content']",
+    f"//*[{_cls('review-container')}]//*[{_cls('content')}]",
+    f"//div[{_cls('text')} and {_cls('show-more__control')}]",
+]
+
+_title_links = [etree.XPath(xpath) for xpath in TITLE_LINK_XPATHS]
+_posters = [etree.XPath(xpath) for xpath in POSTER_XPATHS]
+_reviews = [etree.XPath(xpath) for xpath in REVIEW_XPATHS]
+
+
+def parse(page):
+    return lxml_html.document_fromstring(page)
+
+
+def element_text(element):
+    #same result as BeautifulSoup's get_text(strip=True)
+    return "".join(part.strip() for part in element.itertext() if part.strip())
+
+
+def title_id(tree):
+    for xpath in _title_links:
+        for href in xpath(tree):
+            parts = href.split("/title/")
+            if len(parts) > 1 and parts[1].startswith("tt"):
+                return parts[1].split("/")[0].split("?")[0]
+    return None
+
+
+def poster_url(tree):
+    for xpath in _posters:
+        sources = xpath(tree)
+        if sources:
+            return sources[0]
+    return None
+
+
+def reviews(tree, min_length=20):
+    for xpath in _reviews:
+        elements = xpath(tree)
+        if elements:
+            texts = (element_text(element) for element in elements)
+            return [text for text in texts if text and len(text) > min_length]
+    return []
+
+
+def extract(page):
+    """Title ID, poster URL and review texts from one parse of an IMDb page"""
+    tree = parse(page)
+    return {"title_id": title_id(tree), "poster_url": poster_url(tree), "reviews": reviews(tree)}
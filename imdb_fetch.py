@@ -0,0 +1,337 @@
+"""Async IMDb fetch layer shared by the Streamlit app and the batch tools.
+
+All requests go through one pooled keep-alive httpx client with a per-host concurrency
+limit and retry/backoff. Point IMDB_BASE_URL at a local server that serves saved IMDb
+pages to run everything offline.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from html import unescape
+from urllib.parse import urlsplit
+import time
+import httpx
+import extract
+import metrics
+from metrics import span
+
+IMDB_BASE_URL = os.getenv("IMDB_BASE_URL", "https://www.imdb.com").rstrip("/")
+#later review pages come from IMDb's GraphQL API, the same one its "load more" button calls
+IMDB_GRAPHQL_URL = os.getenv("IMDB_GRAPHQL_URL", "https://caching.graphql.imdb.com/")
+#requests per second per host, 0 means only the concurrency limit applies
+IMDB_RATE_LIMIT = float(os.getenv("IMDB_RATE_LIMIT", "0"))
+
+headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+NEXT_DATA_RE = re.compile(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', re.S)
+TAG_RE = re.compile(r"<[^>]+>")
+
+REVIEWS_QUERY = """
+query TitleReviews($const: ID!, $first: Int!, $after: ID) {
+  title(id: $const) {
+    reviews(first: $first, after: $after, sort: {by: SUBMISSION_DATE, order: DESC}) {
+      edges { node { id authorRating submissionDate text { originalText { plaidHtml } } } }
+      pageInfo { endCursor hasNextPage }
+    }
+  }
+}
+"""
+
+
+def title_url(movie_id, base_url=IMDB_BASE_URL):
+    return f"{base_url}/title/{movie_id}/"
+
+#this is the url set for date modified reviews
+def reviews_url(movie_id, base_url=IMDB_BASE_URL):
+    return f"{base_url}/title/{movie_id}/reviews/?ref_=tt_ururv_genai_sm&sort=submission_date%2Cdesc"
+
+
+HTTP_REQUESTS = metrics.REGISTRY.counter("cinesense_scrape_requests_total", "Scraper HTTP responses by host and status",
+                                         ["host", "status"])
+
+#all page parsing goes through extract.py (lxml, one parse per page)
+def parse_title_id(html):
+    with span("html_parse"):
+        return extract.title_id(extract.parse(html))
+
+def parse_poster(html):
+    with span("html_parse"):
+        return extract.poster_url(extract.parse(html))
+
+def parse_reviews(html):
+    with span("html_parse"):
+        reviews = extract.reviews(extract.parse(html))
+    print(f"Found {len(reviews)} reviews")
+    return reviews
+
+
+def parse_next_data(html):
+    """The JSON payload the reviews page embeds for its own client-side pagination"""
+    with span("html_parse"):
+        match = NEXT_DATA_RE.search(html)
+        if not match:
+            return None
+        try:
+            return json.loads(match.group(1))
+        except ValueError:
+            return None
+
+def _find_review_connection(data):
+    #the reviews connection is the object holding both review edges and a pageInfo cursor
+    if isinstance(data, dict):
+        if isinstance(data.get("edges"), list) and isinstance(data.get("pageInfo"), dict):
+            nodes = [edge.get("node") for edge in data["edges"] if isinstance(edge, dict)]
+            if nodes and all(isinstance(node, dict) and str(node.get("id", "")).startswith("rw") for node in nodes):
+                return data
+        values = data.values()
+    elif isinstance(data, list):
+        values = data
+    else:
+        return None
+    for value in values:
+        found = _find_review_connection(value)
+        if found is not None:
+            return found
+    return None
+
+def _review_text(node):
+    text = node.get("text")
+    if isinstance(text, dict):
+        original = text.get("originalText") or {}
+        html = original.get("plaidHtml") or original.get("plainText") or ""
+    else:
+        html = text or node.get("reviewText") or ""
+    return " ".join(unescape(TAG_RE.sub(" ", html)).split())
+
+def parse_review_connection(data):
+    """Reviews and the next-page cursor from a __NEXT_DATA__ payload or a GraphQL response.
+
+    Each review is a dict with id, text, rating and submitted (date string), and the
+    cursor is None once there are no more pages.
+    """
+    connection = _find_review_connection(data)
+    if connection is None:
+        return [], None
+
+    reviews = []
+    for edge in connection["edges"]:
+        node = edge["node"]
+        text = _review_text(node)
+        if text and len(text) > 20:
+            reviews.append({
+                "id": node["id"],
+                "text": text,
+                "rating": node.get("authorRating"),
+                "submitted": node.get("submissionDate"),
+            })
+
+    page_info = connection["pageInfo"]
+    cursor = page_info.get("endCursor") if page_info.get("hasNextPage") else None
+    return reviews, cursor
+
+
+def _retry_after(value):
+    #IMDb's CDN may send seconds or an HTTP-date, anything else is ignored
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class Fetcher:
+    """Pooled async HTTP client with a per-host concurrency and rate limit and retry/backoff"""
+
+    def __init__(self, base_url=IMDB_BASE_URL, graphql_url=IMDB_GRAPHQL_URL, per_host_limit=4,
+                 per_host_rate=IMDB_RATE_LIMIT, max_connections=20, retries=3, backoff=0.5, timeout=15):
+        self.base_url = base_url.rstrip("/")
+        self.graphql_url = graphql_url
+        self.per_host_limit = per_host_limit
+        self.per_host_rate = per_host_rate
+        self.retries = retries
+        self.backoff = backoff
+        self._host_limits = {}
+        self._next_slot = {}
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def _limit(self, host):
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def _throttle(self, host):
+        #hand out evenly spaced start times per host, so a burst of titles cannot hammer IMDb
+        if not self.per_host_rate:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + 1 / self.per_host_rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def request(self, method, url, stage="fetch", **kwargs):
+        """Send a request, retrying connection errors, 429 and 5xx with exponential backoff.
+
+        The time on the wire is recorded as `stage`, so each kind of page gets its own span.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            try:
+                waiting = time.perf_counter()
+                async with self._limit(host):
+                    await self._throttle(host)
+                    metrics.record("fetch_wait", time.perf_counter() - waiting)
+                    with span(stage):
+                        response = await self.client.request(method, url, **kwargs)
+                HTTP_REQUESTS.inc(host=host, status=response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response
+                #capped at the longest backoff, a far-off Retry-After would stall the whole title
+                delay = min(_retry_after(response.headers.get("Retry-After")), self.backoff * 2 ** self.retries)
+            except httpx.TransportError as e:
+                HTTP_REQUESTS.inc(host=host, status=type(e).__name__)
+                if attempt == self.retries:
+                    raise
+                delay = 0
+            #full jitter so parallel retries do not line up
+            await asyncio.sleep(max(delay, self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)))
+
+    async def fetch_title_id(self, movie_name):
+        response = await self.get(f"{self.base_url}/find", stage="title_lookup", params={"q": movie_name, "s": "tt"})
+        movie_id = parse_title_id(response.text)
+        if movie_id:
+            print(f"Movie ID: {movie_id}")
+        else:
+            print("Movie not found!")
+        return movie_id
+
+    async def fetch_poster(self, movie_id):
+        try:
+            response = await self.get(title_url(movie_id, self.base_url), stage="poster")
+        except httpx.HTTPError as e:
+            print(f"Error getting poster: {e}")
+            return None
+        return parse_poster(response.text)
+
+    async def fetch_reviews(self, movie_id):
+        response = await self.get(reviews_url(movie_id, self.base_url), stage="reviews_page")
+        return parse_reviews(response.text)
+
+    async def iter_review_pages(self, movie_id, page_size=25):
+        """Yield pages of reviews over plain HTTP, newest first, without a browser.
+
+        The first page comes from the __NEXT_DATA__ payload of the reviews page, every
+        later one from the GraphQL endpoint using the cursor of the page before it. A later
+        page that still fails after the retries ends the pagination, so the pages already
+        yielded are kept instead of being thrown away with the error.
+        """
+        response = await self.get(reviews_url(movie_id, self.base_url), stage="reviews_page")
+        data = parse_next_data(response.text)
+        if data is None:
+            return
+        reviews, cursor = parse_review_connection(data)
+        yield reviews
+
+        while cursor:
+            try:
+                response = await self.request("POST", self.graphql_url, stage="reviews_graphql", json={
+                    "operationName": "TitleReviews",
+                    "query": REVIEWS_QUERY,
+                    "variables": {"const": movie_id, "first": page_size, "after": cursor},
+                })
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"Stopped paginating {movie_id} reviews after a failed page: {e}")
+                return
+            reviews, cursor = parse_review_connection(data)
+            if not reviews:
+                return
+            yield reviews
+
+    async def fetch_reviews_paginated(self, movie_id, target=100, stop_at=()):
+        """Follow the pagination cursor until `target` reviews are collected or pages run out.
+
+        Pages are newest first, so with `stop_at` (review IDs already stored) fetching stops
+        at the first known review and only the newer ones are returned.
+        """
+        collected = []
+        async for page in self.iter_review_pages(movie_id):
+            for review in page:
+                if review["id"] in stop_at:
+                    return collected
+                collected.append(review)
+                if len(collected) >= target:
+                    return collected
+        return collected
+
+    async def scrape_title(self, movie_name):
+        """Title ID first, then the reviews page and the poster at the same time"""
+        movie_id = await self.fetch_title_id(movie_name)
+        if not movie_id:
+            return None, [], None
+        reviews, poster_url = await asyncio.gather(self.fetch_reviews(movie_id), self.fetch_poster(movie_id))
+        return movie_id, reviews, poster_url
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+#one event loop on a background thread keeps the client's connections alive between
+#Streamlit reruns, which each run the script on a fresh thread
+_loop = None
+_fetcher = None
+_lock = threading.Lock()
+
+def _background_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="imdb-fetch", daemon=True).start()
+    return _loop
+
+def submit(coro_fn, *args):
+    """Schedule `coro_fn(fetcher, *args)` on the shared loop, returns a concurrent Future"""
+    loop = _background_loop()
+    #the loop thread does not see the caller's context, carry its timing breakdown over
+    timings = metrics.current_timings()
+
+    async def run():
+        global _fetcher
+        if _fetcher is None:
+            _fetcher = Fetcher()
+        if timings is None:
+            return await coro_fn(_fetcher, *args)
+        with metrics.collect_timings(timings):
+            return await coro_fn(_fetcher, *args)
+
+    return asyncio.run_coroutine_threadsafe(run(), loop)
+
+def run(coro_fn, *args):
+    return submit(coro_fn, *args).result()
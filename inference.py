@@ -0,0 +1,138 @@
+import torch
+from metrics import REGISTRY, span
+
+PADDED_TOKENS = REGISTRY.histogram("cinesense_forward_padded_tokens",
+                                   "Padded tokens (rows * longest row) per forward pass",
+                                   buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384))
+TOKENS = REGISTRY.counter("cinesense_tokens_total", "Tokens sent through the model, real tokens and padding", ["kind"])
+
+
+def make_buckets(lengths, token_budget):
+    """Split indices into sub-batches of similar length.
+
+    Indices are sorted by token length and a sub-batch is closed before its padded
+    size (rows * longest row) would go over `token_budget`. A budget of 0 disables
+    bucketing and returns every index in one batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    if not token_budget or token_budget <= 0:
+        return [order] if order else []
+
+    buckets = []
+    current = []
+    for idx in order:
+        #sorted ascending, so the new text is always the longest one in the bucket
+        if current and (len(current) + 1) * lengths[idx] > token_budget:
+            buckets.append(current)
+            current = []
+        current.append(idx)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def predict_logits(forward, tokenizer, texts, max_length=128, token_budget=4096, device=None):
+    """Run texts through `forward` in length-bucketed sub-batches, logits come back in input order"""
+    with span("tokenize"):
+        encoded = tokenizer(texts, truncation=True, max_length=max_length)
+    return predict_ids(forward, tokenizer, encoded["input_ids"], token_budget, device)
+
+
+def predict_ids(forward, tokenizer, input_ids, token_budget=4096, device=None):
+    """Same as `predict_logits` for rows that are already token IDs, special tokens included"""
+    lengths = [len(ids) for ids in input_ids]
+
+    logits = None
+    for bucket in make_buckets(lengths, token_budget):
+        with span("tokenize"):
+            features = [{"input_ids": input_ids[i], "attention_mask": [1] * lengths[i]} for i in bucket]
+            inputs = tokenizer.pad(features, return_tensors="pt")
+        if device is not None:
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+
+        padded = inputs["input_ids"].numel()
+        real = sum(lengths[i] for i in bucket)
+        PADDED_TOKENS.observe(padded)
+        TOKENS.inc(real, kind="real")
+        TOKENS.inc(padded - real, kind="padding")
+        with span("forward"), torch.no_grad():
+            out = forward(**inputs)
+
+        if logits is None:
+            logits = out.new_empty((len(input_ids), out.shape[-1]))
+        #scatter rows back to where the texts were in the request
+        logits[torch.tensor(bucket)] = out
+    return logits
+
+
+def _window_limit(counts, max_windows):
+    """Largest per-text window count that keeps the total under `max_windows`, at least 1"""
+    limit = 1
+    while limit < max(counts) and sum(min(count, limit + 1) for count in counts) <= max_windows:
+        limit += 1
+    return limit
+
+
+def _special_tokens(tokenizer):
+    """IDs the tokenizer puts before and after a single text, e.g. <s> and </s> for RoBERTa"""
+    wrapped = tokenizer("a")["input_ids"]
+    body = tokenizer("a", add_special_tokens=False)["input_ids"]
+    start = next(i for i in range(len(wrapped)) if wrapped[i:i + len(body)] == body)
+    return wrapped[:start], wrapped[start + len(body):]
+
+
+def split_windows(tokenizer, texts, max_length=128, stride=96, max_windows=0):
+    """Cut every text into overlapping windows of at most `max_length` tokens.
+
+    Windows start `stride` tokens apart and the last one is aligned to the end of the
+    text, so a text that fits in one window gets exactly the IDs truncation would give.
+    When the texts need more than `max_windows` windows in total (0 = no cap), the texts
+    with the most windows are thinned first, keeping evenly spaced ones including the
+    first and the last. Every text keeps at least one window.
+
+    Returns (windows, owners, weights, complete): the token IDs of each window, the index
+    of the text it came from, how many of the text's tokens it holds and, per text,
+    whether all of its windows were kept.
+    """
+    prefix, suffix = _special_tokens(tokenizer)
+    body = max_length - len(prefix) - len(suffix)
+    stride = max(1, min(stride, body))
+    with span("tokenize"):
+        #no truncation here, long texts are the point, so the length warning is noise
+        encoded = tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]
+
+    starts = [list(range(0, max(len(ids) - body, 0), stride)) + [max(len(ids) - body, 0)] for ids in encoded]
+    counts = [len(text_starts) for text_starts in starts]
+    limit = max(counts, default=0)
+    if max_windows and sum(counts) > max_windows:
+        limit = _window_limit(counts, max_windows)
+
+    windows, owners, weights = [], [], []
+    for i, (ids, text_starts) in enumerate(zip(encoded, starts)):
+        if len(text_starts) > limit:
+            keep = sorted({round(k * (len(text_starts) - 1) / max(limit - 1, 1)) for k in range(limit)})
+            text_starts = [text_starts[k] for k in keep]
+        for start in text_starts:
+            window = ids[start:start + body]
+            windows.append(prefix + window + suffix)
+            owners.append(i)
+            weights.append(max(len(window), 1))
+    return windows, owners, weights, [count <= limit for count in counts]
+
+
+def pool_windows(window_logits, owners, weights, num_texts):
+    """Per-text logits as the mean of its windows' logits, weighted by tokens per window"""
+    owners = torch.tensor(owners, device=window_logits.device)
+    weights = torch.tensor(weights, dtype=window_logits.dtype, device=window_logits.device)
+    sums = window_logits.new_zeros((num_texts, window_logits.shape[-1]))
+    sums.index_add_(0, owners, window_logits * weights.unsqueeze(-1))
+    totals = window_logits.new_zeros(num_texts).index_add_(0, owners, weights)
+    return sums / totals.unsqueeze(-1)
+
+
+def predict_logits_windowed(forward, tokenizer, texts, max_length=128, stride=96, max_windows=0,
+                            token_budget=4096, device=None):
+    """`predict_logits` over sliding windows, long texts are scored on all of their tokens"""
+    windows, owners, weights, _ = split_windows(tokenizer, texts, max_length, stride, max_windows)
+    logits = predict_ids(forward, tokenizer, windows, token_budget, device)
+    return pool_windows(logits, owners, weights, len(texts))
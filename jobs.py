@@ -0,0 +1,96 @@
+"""Background jobs shared by every Streamlit session in the process.
+
+A job runs on a shared thread pool and publishes its partial results on the Job object
+as they arrive, so the page that started it (or any other page asking for the same key)
+only reads the latest snapshot and never blocks on the work itself. Jobs are keyed:
+submitting a key that is already running joins the running job, and a finished job is
+reused until it is `ttl` seconds old (`error_ttl` for failed ones, so the error is shown
+to every page that asked instead of being retried on the spot).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.status = "running"
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        #seconds per stage, for metrics.collect_timings inside the job
+        self.timings = {}
+        self._state = {"notes": []}
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            self._state.update(fields)
+
+    def note(self, message, kind="info"):
+        """A status line for the page, kind is a Streamlit message type (info, success, warning, error)"""
+        with self._lock:
+            self._state["notes"] = self._state["notes"] + [(kind, message)]
+
+    def snapshot(self):
+        """Copy of the results so far plus status, error and timings, safe to read while the job runs"""
+        with self._lock:
+            state = dict(self._state)
+            state.update(status=self.status, error=self.error, timings=metrics.copy_timings(self.timings))
+        return state
+
+    @property
+    def done(self):
+        return self.status != "running"
+
+    def _finish(self, error=None):
+        with self._lock:
+            self.error = error
+            self.status = "failed" if error else "done"
+            self.finished = time.time()
+
+
+class JobRunner:
+    def __init__(self, max_workers=4, ttl=600, error_ttl=10):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, job, now):
+        if not job.done:
+            return False
+        return now - job.finished > (self.error_ttl if job.status == "failed" else self.ttl)
+
+    def submit(self, key, fn, *args):
+        """The job for `key`, running `fn(job, *args)` in the background unless one is running or fresh"""
+        now = time.time()
+        with self._lock:
+            for old_key in [k for k, job in self._jobs.items() if self._expired(job, now)]:
+                del self._jobs[old_key]
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._jobs[key] = Job(key)
+                self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _run(self, job, fn, args):
+        try:
+            fn(job, *args)
+        except Exception as e:
+            print(f"Job {job.key!r} failed: {e}")
+            job._finish(str(e))
+            return
+        job._finish()
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {"running": sum(not job.done for job in jobs), "memoized": sum(job.done for job in jobs)}
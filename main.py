@@ -1,9 +1,8 @@
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
@@ -13,12 +12,16 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import requests
-import json
 import time
 import os
 import sys
-
-BACKEND_URL = "https://hetbhalani-movie-sentiment-fastapi.hf.space/predict"
+from scoring import star_score
+import imdb_fetch
+import metrics
+from backend_client import BackendClient
+from driver_pool import DriverPool
+from jobs import JobRunner
+from review_store import ReviewStore, normalize_name
 
 st.set_page_config(
     page_title="Movie Sentiment Analysis",
@@ -34,11 +37,37 @@ col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
     movie_name = st.text_input("🔍 Enter a movie name", placeholder="e.g., The Dark Knight")
 
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
+#browsers kept warm and shared by every session, more searches than this wait their turn
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "2"))
+#a browser is restarted after this many pages to keep its memory in check
+DRIVER_MAX_PAGES = int(os.getenv("DRIVER_MAX_PAGES", "50"))
+
+#reviews to collect over plain HTTP pagination before falling back to the browser
+REVIEW_TARGET = int(os.getenv("REVIEW_TARGET", "100"))
+
+#searches run on this many background threads shared by every session, and a finished
+#search is shown again without any work for SEARCH_CACHE_SECONDS
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+SEARCH_CACHE_SECONDS = float(os.getenv("SEARCH_CACHE_SECONDS", "600"))
+#how often a page checks its search for new results
+POLL_SECONDS = 0.5
+
+#serve scrape metrics on http://host:METRICS_PORT/metrics, 0 keeps it off
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
 
+#one metrics server per process, not one per rerun
 @st.cache_resource
+def start_metrics_server():
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+
+start_metrics_server()
+
+#resolve the ChromeDriver binary once per process, not once per browser
+@st.cache_resource
+def get_chromedriver_path():
+    return ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
+
 def get_webdriver():
     """Initialize and return a Chrome webdriver optimized for Streamlit Cloud"""
     
@@ -101,334 +130,370 @@ def get_webdriver():
     
     try:
         # Use webdriver-manager to automatically handle ChromeDriver
-        service = Service(ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install())
+        service = Service(get_chromedriver_path())
         driver = webdriver.Chrome(service=service, options=options)
         
-        # Set timeouts
+        # Set timeouts, no implicit wait so element lookups never stall, every wait is explicit
         driver.set_page_load_timeout(30)
-        driver.implicitly_wait(10)
+        driver.implicitly_wait(0)
         
         return driver
     except Exception as e:
-        st.error(f"Failed to initialize Chrome driver: {str(e)}")
+        #browsers start on the search threads, where there is no page to show this on
+        print(f"Failed to initialize Chrome driver: {str(e)}")
         # Try alternative initialization
         try:
             driver = webdriver.Chrome(options=options)
             driver.set_page_load_timeout(30)
-            driver.implicitly_wait(10)
+            driver.implicitly_wait(0)
             return driver
         except:
             return None
 
+#title IDs, posters and scored reviews from earlier searches
+@st.cache_resource
+def get_review_store():
+    return ReviewStore()
+
+#one pooled session to the backend for every session, chunks of a list are sent in parallel
+@st.cache_resource
+def get_backend_client():
+    return BackendClient()
+
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(max_workers=SEARCH_WORKERS, ttl=SEARCH_CACHE_SECONDS)
+
+@st.cache_resource
+def get_driver_pool():
+    pool = DriverPool(get_webdriver, size=DRIVER_POOL_SIZE, max_pages=DRIVER_MAX_PAGES)
+    pool.warm(1)
+    return pool
+
 # Movie URL for ID
 def get_movie_url(movie_name):
-    search_url = f"https://www.imdb.com/find?q={movie_name}&s=tt"
     try:
-        search_response = requests.get(search_url, headers=headers, timeout=10)
-        search_response.raise_for_status()
-        search_soup = BeautifulSoup(search_response.text, "html.parser")
-        
-        # Multiple selectors if anyone fails
-        selectors = [
-            "a.ipc-metadata-list-summary-item__t",
-            "a[href*='/title/tt']",
-            ".findResult .result_text a"
-        ]
-        
-        movie_link_tag = None
-        for selector in selectors:
-            movie_link_tag = search_soup.select_one(selector)
-            if movie_link_tag:
-                break
-        
-        #here we get the movie id to make full url
-        if movie_link_tag:
-            movie_link = movie_link_tag['href']
-            movie_id = movie_link.split('/')[2]
-            print(f"Movie ID: {movie_id}")
-            return movie_id
-        else:
-            print("Movie not found!")
-            return None
-            
+        return imdb_fetch.run(imdb_fetch.Fetcher.fetch_title_id, movie_name)
     except Exception as e:
         print(f"Error searching for movie: {e}")
         return None
 
-#this is for showing poster
-def get_movie_poster(movie_id):
-    movie_page_url = f"https://www.imdb.com/title/{movie_id}/"
-    
-    try:
-        response = requests.get(movie_page_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        #multiple selectors if anyone fails
-        poster_selectors = [
-            "img.ipc-image",
-            "img[class*='poster']",
-            "div.ipc-media img",
-            "img.ipc-lockup-overlay__screen",
-            "div.ipc-poster img",
-            ".poster img",
-            "[data-testid='hero-media__poster'] img"
-        ]
-        
-        for selector in poster_selectors:
-            poster_tag = soup.select_one(selector)
-            if poster_tag and poster_tag.get('src'):
-                poster_url = poster_tag['src']
-                print(f"Found poster using selector: {selector}")
-                return poster_url
-        
-        print("No poster found with any selector")
-        return None
-        
-    except Exception as e:
-        print(f"Error getting poster: {e}")
-        return None
+SHOW_ALL_BUTTON_SELECTORS = [
+    "//button[contains(@class, 'ipc-see-more__button')]",
+    "//button[contains(text(), 'Show All')]",
+    "//button[contains(text(), 'Load More')]",
+    "//span[contains(text(), 'Show All')]/parent::button",
+    "//button[@data-testid='load-more-button']",
+    "//button[contains(@class, 'load-more')]"
+]
 
-#click the show all button to get more reviews
-def click_show_all_button(driver, max_clicks=3):
+#any review card, used to tell when the page (or a "load more") has actually delivered reviews
+REVIEW_CARDS_CSS = ", ".join([
+    "div.ipc-html-content-inner-div",
+    "div.content .text",
+    "div[data-testid='review-content']",
+    ".review-container .content",
+    "div.text.show-more__control"
+])
+
+def count_review_cards(driver):
+    return len(driver.find_elements(By.CSS_SELECTOR, REVIEW_CARDS_CSS))
+
+def find_show_all_button(driver):
+    for selector in SHOW_ALL_BUTTON_SELECTORS:
+        for button in driver.find_elements(By.XPATH, selector):
+            if button.is_displayed() and button.is_enabled():
+                return button, selector
+    return None, None
+
+#click the show all button to get more reviews, waiting on the page instead of fixed sleeps
+#returns (clicks, seconds waited, why it stopped)
+def click_show_all_button(driver, max_clicks=3, deadline=20, click_timeout=8):
     clicks = 0
-    wait = WebDriverWait(driver, 10)
-    
-    button_selectors = [
-        "//button[contains(@class, 'ipc-see-more__button')]",
-        "//button[contains(text(), 'Show All')]",
-        "//button[contains(text(), 'Load More')]",
-        "//span[contains(text(), 'Show All')]/parent::button",
-        "//button[@data-testid='load-more-button']",
-        "//button[contains(@class, 'load-more')]"
-    ]
-    
+    start = time.monotonic()
+    end = start + deadline
+    reason = "max_clicks"
+
     while clicks < max_clicks:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            reason = "deadline"
+            break
         try:
-            # Scroll to bottom first
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            
-            button_found = False
-            for selector in button_selectors:
-                try:
-                    elements = driver.find_elements(By.XPATH, selector)
-                    for button in elements:
-                        if button and button.is_displayed() and button.is_enabled():
-                            print(f"Found button with selector: {selector}")
-                            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
-                            time.sleep(1)
-                            
-                            try:
-                                driver.execute_script("arguments[0].click();", button)
-                            except:
-                                button.click()
-                            
-                            clicks += 1
-                            print(f"Clicked button {clicks} time(s)")
-                            time.sleep(3)
-                            button_found = True
-                            break
-                    
-                    if button_found:
-                        break
-                        
-                except (TimeoutException, NoSuchElementException):
-                    continue
-            
-            if not button_found:
-                print("No more buttons to click")
+            button, selector = find_show_all_button(driver)
+            if button is None:
+                reason = "no_button"
                 break
-                
+
+            print(f"Found button with selector: {selector}")
+            before = count_review_cards(driver)
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
+            try:
+                driver.execute_script("arguments[0].click();", button)
+            except:
+                button.click()
+
+            clicks += 1
+            print(f"Clicked button {clicks} time(s)")
+
+            #the click landed once new cards show up or the button gets replaced
+            try:
+                WebDriverWait(driver, min(remaining, click_timeout), poll_frequency=0.1).until(
+                    lambda d: count_review_cards(d) > before or EC.staleness_of(button)(d)
+                )
+            except TimeoutException:
+                reason = "deadline" if time.monotonic() >= end else "no_new_reviews"
+                break
+
         except Exception as e:
             print(f"Error clicking button: {str(e)}")
+            reason = "error"
             break
-    
-    return clicks
+
+    waited = time.monotonic() - start
+    print(f"Load more stopped after {clicks} click(s) and {waited:.1f}s: {reason}")
+    return clicks, waited, reason
 
 #when selenium fails on server, this will find the available reviews only
+#reviews page and poster are fetched at the same time once the title ID is known
 def get_reviews_fallback(movie_name):
-    movie_id = get_movie_url(movie_name)
-    if not movie_id:
-        return [], None
-    
-    reviews_url = f"https://www.imdb.com/title/{movie_id}/reviews/?ref_=tt_ururv_genai_sm&sort=submission_date%2Cdesc"
-    
     try:
-        response = requests.get(reviews_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        reviews = []
-        
-        #multiple selectors for reviews
-        review_selectors = [
-            "div.ipc-html-content-inner-div",
-            "div.content .text", 
-            "div[data-testid='review-content']",
-            ".review-container .content"
-        ]
-        
-        for selector in review_selectors:
-            review_elements = soup.select(selector)
-            if review_elements:
-                print(f"Found {len(review_elements)} reviews with selector: {selector}")
-                for review in review_elements:
-                    text = review.get_text(strip=True)
-                    if text and len(text) > 20:
-                        reviews.append(text)
-                break
-        
-        poster_url = get_movie_poster(movie_id)
+        movie_id, reviews, poster_url = imdb_fetch.run(imdb_fetch.Fetcher.scrape_title, movie_name)
+        if not movie_id:
+            return [], None
         return reviews, poster_url
-        
+
     except Exception as e:
         print(f"Error in fallback method: {e}")
         return [], None
 
-#scrap reviews
-def get_reviews(movie_name):
-    movie_id = get_movie_url(movie_name)
+#scrap reviews, runs on a search thread and reports progress on `job`
+#returns (review texts, poster url, title id)
+def get_reviews(movie_name, store, job):
+    #titles looked up before skip the IMDb search
+    movie_id = store.get_title_id(movie_name)
     if not movie_id:
-        return [], None
+        movie_id = get_movie_url(movie_name)
+        if not movie_id:
+            return [], None, None
+        store.put_title_id(movie_name, movie_id)
     
-    #this is the url set for date modified reviews
-    reviews_url = f"https://www.imdb.com/title/{movie_id}/reviews/?ref_=tt_ururv_genai_sm&sort=submission_date%2Cdesc"
+    reviews_url = imdb_fetch.reviews_url(movie_id)
+
+    #the poster does not need the browser, fetch it while the reviews load
+    stored_poster = store.get_poster(movie_id)
+    poster_future = None if stored_poster else imdb_fetch.submit(imdb_fetch.Fetcher.fetch_poster, movie_id)
+    #the page shows the poster as soon as it is known, before any review
+    if stored_poster:
+        job.update(poster_url=stored_poster)
+    else:
+        def publish_poster(future):
+            if future.exception() is None:
+                job.update(poster_url=future.result())
+        poster_future.add_done_callback(publish_poster)
+
+    def poster():
+        if stored_poster:
+            return stored_poster
+        poster_url = poster_future.result()
+        if poster_url:
+            store.put_poster(movie_id, poster_url)
+        return poster_url
+
+    #follow the reviews page's own pagination data over plain HTTP first, no browser needed.
+    #reviews come newest first, so only the ones newer than what is stored get fetched
+    try:
+        known = store.known_review_ids(movie_id)
+        new_reviews = imdb_fetch.run(imdb_fetch.Fetcher.fetch_reviews_paginated, movie_id, REVIEW_TARGET, known)
+        store.add_reviews(movie_id, new_reviews)
+    except Exception as e:
+        print(f"Pagination method error: {e}")
+        new_reviews = []
+
+    reviews = [review["text"] for review in store.get_reviews(movie_id, limit=REVIEW_TARGET)]
+    if reviews:
+        job.note(f"✅ Successfully fetched {len(reviews)} reviews ({len(new_reviews)} new)", "success")
+        return reviews, poster(), movie_id
+    print("No pagination data on the reviews page, using the browser")
     
+    pool = get_driver_pool()
     driver = None
+    broken = False
     try:
-        st.info("🔄 Initializing browser for enhanced scraping...")
-        driver = get_webdriver()
-        
-        if driver is None:
-            raise Exception("Could not initialize Chrome driver")
+        job.note("🔄 Waiting for a browser for enhanced scraping...")
+        with metrics.span("browser_checkout"):
+            driver = pool.checkout()
         
         print(f"Loading reviews page: {reviews_url}")
-        driver.get(reviews_url)
+        with metrics.span("browser_page_load"):
+            driver.get(reviews_url)
         
-        # Wait for initial page load
-        try:
-            wait = WebDriverWait(driver, 15)
-            wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        except:
-            pass
-        
-        time.sleep(5)
+            # Wait for the first review cards instead of a fixed pause
+            load_start = time.monotonic()
+            try:
+                wait = WebDriverWait(driver, 15, poll_frequency=0.1)
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, REVIEW_CARDS_CSS)))
+            except TimeoutException:
+                pass
+        print(f"Reviews page ready after {time.monotonic() - load_start:.1f}s")
         
         # Try to click "Show All" buttons to load more reviews
-        total_clicks = click_show_all_button(driver, max_clicks=3)
+        with metrics.span("browser_load_more"):
+            total_clicks, waited, reason = click_show_all_button(driver, max_clicks=3)
         print(f"Total buttons clicked: {total_clicks}")
         
-        # Final scroll and wait
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
-        
         # Get page source
         page_source = driver.page_source
         
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(page_source, "html.parser")
-        reviews = []
-        
-        # multiple selectors for reviews
-        review_selectors = [
-            "div.ipc-html-content-inner-div",
-            "div.content .text",
-            "div[data-testid='review-content']", 
-            ".review-container .content",
-            "div.text.show-more__control"
-        ]
-        
-        for selector in review_selectors:
-            review_elements = soup.select(selector)
-            if review_elements:
-                print(f"Found {len(review_elements)} reviews with selector: {selector}")
-                for review in review_elements:
-                    text = review.get_text(strip=True)
-                    if text and len(text) > 20:
-                        reviews.append(text)
-                break
+        # Parse with lxml
+        reviews = imdb_fetch.parse_reviews(page_source)
         
-        poster_url = get_movie_poster(movie_id)
+        poster_url = poster()
         
         if reviews:
-            st.success(f"✅ Successfully scraped {len(reviews)} reviews using enhanced method")
-            return reviews, poster_url
+            job.note(f"✅ Successfully scraped {len(reviews)} reviews using enhanced method", "success")
+            return reviews, poster_url, movie_id
         else:
             raise Exception("No reviews found with Selenium, trying fallback")
             
     except Exception as e:
         print(f"Selenium method error: {e}")
-        st.warning("🔄 Primary method encountered issues, trying alternative approach...")
+        #a crashed or hung browser is recycled instead of going back to the pool
+        broken = isinstance(e, WebDriverException)
+        job.note("🔄 Primary method encountered issues, trying alternative approach...", "warning")
         
         #try fallback method
         try:
             reviews, poster_url = get_reviews_fallback(movie_name)
             if reviews:
-                st.info(f"✅ Successfully retrieved {len(reviews)} reviews using alternative method")
-                return reviews, poster_url
+                job.note(f"✅ Successfully retrieved {len(reviews)} reviews using alternative method")
+                return reviews, poster_url, movie_id
             else:
-                return [], None
+                return [], None, None
         except Exception as fallback_error:
             print(f"Fallback method also failed: {fallback_error}")
-            return [], None
+            return [], None, None
     finally:
-        # Always close the driver if it was initialized
+        # Hand the browser back warm for the next search
         if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+            pool.checkin(driver, broken=broken)
 
-################################ Streamlit ###################################
-if movie_name:
+#the whole search as one background job: poster, then reviews, then sentiments chunk by chunk.
+#everything is published on `job` as it arrives, the page only draws what is there so far
+def run_search(job, movie_name, store, backend):
     print(f"Scraping reviews for: {movie_name}")
-    
-    with st.spinner("🔄 Scraping movie reviews and poster..."):
-        movie_reviews, poster_url = get_reviews(movie_name)
+    with metrics.collect_timings(job.timings):
+        movie_reviews, poster_url, movie_id = get_reviews(movie_name, store, job)
+    if not movie_reviews:
+        #scrape failures end up here too, so this must not be memoized like a real result
+        raise LookupError("❌ No reviews found for this movie. Please check the movie name and try again.")
+    print(f"\nTotal reviews scraped: {len(movie_reviews)}")
 
-    if movie_reviews:
-        print(f"\nTotal reviews scraped: {len(movie_reviews)}")
-        
-        st.markdown("---")
-        
-        st.subheader(f"🎭 {movie_name}")
-        poster_col1, poster_col2, poster_col3 = st.columns([1, 1, 1])
-        with poster_col2:
-            if poster_url:
-                st.image(poster_url, width=300, caption=f"{movie_name}")
-            else:
-                st.warning("⚠️ Could not retrieve movie poster")
-        
-        st.markdown("---")
-        
+    #reviews scored on an earlier search keep their stored sentiment, only new ones go to the backend
+    stored = store.stored_sentiments(movie_id)
+    sentiment_results = [stored.get(review) for review in movie_reviews]
+    to_score = [i for i, sentiment in enumerate(sentiment_results) if sentiment is None]
+    job.update(movie_id=movie_id, poster_url=poster_url, reviews=movie_reviews, sentiments=list(sentiment_results))
+
+    scored = 0
+    scoring_start = time.perf_counter()
+    try:
+        #chunks come back in order as soon as each one and all before it are scored
+        chunks = backend.iter_chunks([movie_reviews[i] for i in to_score]) if to_score else []
+        for chunk in chunks:
+            for sentiment in chunk:
+                sentiment_results[to_score[scored]] = sentiment
+                scored += 1
+            job.update(sentiments=list(sentiment_results))
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise RuntimeError(f"Error fetching sentiment results: {e}")
+
+    metrics.record("sentiment_backend", time.perf_counter() - scoring_start, job.timings)
+    store.save_sentiments(movie_id, {movie_reviews[i]: sentiment_results[i] for i in to_score})
+
+def count_sentiments(sentiments):
+    sentiment_counts = {"Positive": 0, "Neutral": 0, "Negative": 0}
+    for sentiment in sentiments:
+        if sentiment is not None:
+            sentiment_counts[sentiment] += 1
+    return sentiment_counts
+
+def render_title(movie_name, state):
+    st.markdown("---")
+    
+    st.subheader(f"🎭 {movie_name}")
+    poster_col1, poster_col2, poster_col3 = st.columns([1, 1, 1])
+    with poster_col2:
+        if state.get("poster_url"):
+            st.image(state["poster_url"], width=300, caption=f"{movie_name}")
+        elif state["status"] != "running":
+            st.warning("⚠️ Could not retrieve movie poster")
+    
+    st.markdown("---")
+    
+    if state.get("reviews"):
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("📊 Total Reviews Scraped", len(movie_reviews))
+            st.metric("📊 Total Reviews Scraped", len(state["reviews"]))
+
+    for kind, message in state["notes"]:
+        getattr(st, kind)(message)
+
+#redrawn every POLL_SECONDS while the search runs, without rerunning the rest of the page
+def render_running(job, movie_name):
+    if job.done:
+        #one full rerun draws the finished results
+        st.rerun()
+    state = job.snapshot()
+    render_title(movie_name, state)
+
+    if not state.get("reviews"):
+        st.info("🔄 Scraping movie reviews and poster...")
+        return
+
+    st.subheader("🎯 Sentiment Analysis Results")
+    movie_reviews, sentiments = state["reviews"], state["sentiments"]
+    done = sum(sentiment is not None for sentiment in sentiments)
+    st.progress(min(done / len(movie_reviews), 1.0), text=f"🧠 Analyzed {done} of {len(movie_reviews)} reviews...")
+    sentiment_counts = count_sentiments(sentiments)
+    live_col1, live_col2, live_col3 = st.columns(3)
+    live_col1.metric("✅ Positive", sentiment_counts["Positive"])
+    live_col2.metric("😐 Neutral", sentiment_counts["Neutral"])
+    live_col3.metric("❌ Negative", sentiment_counts["Negative"])
+
+################################ Streamlit ###################################
+if movie_name:
+    #searches for the same title from any session share one job, and its result while it is fresh
+    job = get_job_runner().submit(normalize_name(movie_name), run_search, movie_name, get_review_store(),
+                                    get_backend_client())
+    state = job.snapshot()
+    movie_reviews = state.get("reviews")
+
+    if not job.done:
+        st.fragment(run_every=POLL_SECONDS)(render_running)(job, movie_name)
+
+    elif state["error"]:
+        render_title(movie_name, state)
+        st.error(state["error"])
+        if not movie_reviews:
+            st.info("💡 Try using the exact movie title or a popular movie name.")
+
+    elif movie_reviews:
+        render_title(movie_name, state)
         
         if len(movie_reviews) > 0:
             st.subheader("🎯 Sentiment Analysis Results")
+
+            sentiment_results = state["sentiments"]
+            sentiment_counts = count_sentiments(sentiment_results)
+            total_reviews = len(sentiment_results)
+            timings = state["timings"]
             
-            with st.spinner("🧠 Analyzing sentiments..."):
-                #data to send to FastAPI
-                data = {"reviews": movie_reviews}
-
-                try:
-                    #POST request
-                    response = requests.post(BACKEND_URL, json=data)
-                    response.raise_for_status()
-                    #parsing
-                    sentiment_results = response.json()["sentiments"]
-                    
-                    #sentiment counts
-                    sentiment_counts = {sentiment: sentiment_results.count(sentiment) for sentiment in ["Positive", "Neutral", "Negative"]}
-                    total_reviews = len(sentiment_results)
-                    
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Error fetching sentiment results: {e}")
-                    st.stop()
-            
-            stars = ((sentiment_counts['Positive'] * 10) + (sentiment_counts['Neutral'] * 5) + (sentiment_counts['Negative'] * 3)) / total_reviews
+            with st.expander("⏱️ Where the time went"):
+                st.dataframe(pd.DataFrame({"Stage": list(timings), "Seconds": [round(t, 3) for t in timings.values()]}),
+                             hide_index=True)
+
+            stars = star_score(sentiment_counts)
             # tabs for different views
             tab1, tab2, tab3 = st.tabs(["📊 Overview", "📈 Charts", "📝 Reviews"])
             
@@ -544,11 +609,7 @@ if movie_name:
 
                 if not show_all and len(filtered_reviews) > 10:
                     st.info(f"💡 Showing 10 out of {len(filtered_reviews)} reviews. Check 'Show all reviews' to see more.")
-                
-        
-    else:
-        st.error("❌ No reviews found for this movie. Please check the movie name and try again.")
-        st.info("💡 Try using the exact movie title or a popular movie name.")
+
         
 else:
     st.info("👋 Welcome! Enter a movie name above to get started.")
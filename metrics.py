@@ -0,0 +1,248 @@
+"""Timing spans, counters and histograms, rendered in the Prometheus text format.
+
+`span("stage")` times a block into the cinesense_stage_seconds histogram and, when a
+`collect_timings()` block is active on the calling thread or task, adds the duration
+to that per-request breakdown as well. Code running in another process can `capture()`
+its metric updates and send them back, where `replay()` applies them to REGISTRY.
+
+Kept dependency free, the few metric types used here are small enough to not need
+prometheus_client.
+"""
+import contextvars
+import http.server
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_timings = contextvars.ContextVar("timings", default=None)
+#a breakdown can be shared by threads (a search job and the fetch loop), so every update
+#and copy of one takes this lock
+_timings_lock = threading.Lock()
+_captured = contextvars.ContextVar("captured", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        _capture(self.name, "inc", amount, labels)
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        _capture(self.name, "observe", value, labels)
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            #cumulative bucket counts, sum, count
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, cumulative in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Callback:
+    """Gauge or counter read from `fn` at scrape time, `fn` returns a number or {label value: number}"""
+
+    def __init__(self, name, help, fn, kind="gauge", label=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+        self.label = label
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if isinstance(value, dict):
+            for key, item in sorted(value.items()):
+                lines.append(f"{self.name}{_format_labels((self.label,), (key,))} {item}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        #modules can be reloaded (Streamlit reruns), keep the first instance of a name
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def callback(self, name, help, fn, kind="gauge", label=None):
+        #callbacks are replaced, they close over objects that can be rebuilt
+        with self._lock:
+            self._metrics[name] = Callback(name, help, fn, kind, label)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("cinesense_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+
+
+@contextmanager
+def collect_timings(timings=None):
+    """Record every span inside the block into `timings` (a new dict by default), stage -> seconds"""
+    timings = {} if timings is None else timings
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current_timings():
+    return _timings.get()
+
+
+def record(stage, seconds, timings=None):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = current_timings() if timings is None else timings
+    if timings is not None:
+        merge_timings(timings, {stage: seconds})
+
+
+def merge_timings(timings, other):
+    """Add the seconds per stage of `other` to `timings`, without observing them again"""
+    with _timings_lock:
+        for stage, seconds in other.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def copy_timings(timings):
+    """Copy of a breakdown that other threads may still be adding to"""
+    with _timings_lock:
+        return dict(timings)
+
+
+def _capture(name, method, value, labels):
+    events = _captured.get()
+    if events is not None:
+        events.append((name, method, value, labels))
+
+
+@contextmanager
+def capture():
+    """Also log every counter and histogram update inside the block to a list (picklable)"""
+    events = []
+    token = _captured.set(events)
+    try:
+        yield events
+    finally:
+        _captured.reset(token)
+
+
+def replay(events):
+    """Apply updates logged by `capture()`, usually in another process, to REGISTRY"""
+    for name, method, value, labels in events:
+        metric = REGISTRY.get(name)
+        if metric is not None:
+            getattr(metric, method)(value, **labels)
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def server_timing(timings):
+    """Server-Timing header value for a breakdown, durations in ms"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serve REGISTRY on http://host:port/metrics from a daemon thread, for processes without a web app"""
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
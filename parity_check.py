@@ -0,0 +1,84 @@
+"""Compare the labels of the faster inference backends against the fp32 eager model.
+
+    python parity_check.py --backends int8 torchscript --limit 500
+"""
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+import torch
+from transformers import RobertaForSequenceClassification, RobertaTokenizer
+from backends import BACKENDS, load_backend
+from inference import predict_logits
+from token_cache import get_or_build
+
+
+def run(forward, tokenizer, texts, batch_size, max_length, cache=None):
+    preds = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        if cache is not None:
+            logits = cache.predict_logits(forward, range(i, min(i + batch_size, len(texts))))
+        else:
+            logits = predict_logits(forward, tokenizer, texts[i:i + batch_size], max_length=max_length)
+        preds.extend(logits.argmax(-1).tolist())
+    return preds, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="hetbhalani/roberta-enhanced-for-sentiment")
+    parser.add_argument("--csv", default="cleaned_sentiment_dataset.csv")
+    parser.add_argument("--backends", nargs="+", default=["int8", "torchscript"], choices=BACKENDS)
+    parser.add_argument("--limit", type=int, default=0, help="only use the first N reviews")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--token-cache", action="store_true",
+                        help="tokenize the reviews once into token_cache.py's cache and reuse it for every backend")
+    parser.add_argument("--min-agreement", type=float, default=0.97,
+                        help="exit with an error if any backend agrees with fp32 less than this")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv).dropna(subset=["review"])
+    if args.limit:
+        df = df.head(args.limit)
+    texts = df["review"].astype(str).tolist()
+    labels = df["label"].tolist() if "label" in df.columns else None
+
+    model = RobertaForSequenceClassification.from_pretrained(args.model)
+    model.eval()
+    tokenizer = RobertaTokenizer.from_pretrained(args.model)
+    cache = None
+    if args.token_cache:
+        name = os.path.splitext(os.path.basename(args.csv))[0]
+        cache = get_or_build(texts, tokenizer, name, args.max_length, labels)
+
+    reference, ref_seconds = run(load_backend("eager", model, tokenizer), tokenizer, texts,
+                                 args.batch_size, args.max_length, cache)
+    print(f"{'backend':<12} {'agreement':>10} {'accuracy':>9} {'seconds':>8} {'speedup':>8}")
+
+    def report(name, preds, seconds):
+        agreement = sum(p == r for p, r in zip(preds, reference)) / len(texts)
+        accuracy = sum(p == l for p, l in zip(preds, labels)) / len(texts) if labels else float("nan")
+        print(f"{name:<12} {agreement:>10.2%} {accuracy:>9.2%} {seconds:>8.1f} {ref_seconds / seconds:>7.2f}x")
+        return agreement
+
+    report("eager", reference, ref_seconds)
+    failed = []
+    for name in args.backends:
+        if name == "eager":
+            continue
+        preds, seconds = run(load_backend(name, model, tokenizer), tokenizer, texts,
+                             args.batch_size, args.max_length, cache)
+        if report(name, preds, seconds) < args.min_agreement:
+            failed.append(name)
+
+    if failed:
+        print(f"Below {args.min_agreement:.0%} agreement with fp32: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    torch.set_grad_enabled(False)
+    main()
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+import time
+
+REVIEW_STORE_PATH = os.getenv("REVIEW_STORE_PATH", "cinesense.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    name TEXT PRIMARY KEY,
+    title_id TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS posters (
+    title_id TEXT PRIMARY KEY,
+    poster_url TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    title_id TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    submitted TEXT,
+    text TEXT NOT NULL,
+    rating INTEGER,
+    sentiment TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (title_id, review_id)
+);
+CREATE INDEX IF NOT EXISTS reviews_by_date ON reviews (title_id, submitted DESC);
+"""
+
+
+def normalize_name(movie_name):
+    return " ".join(movie_name.lower().split())
+
+
+class ReviewStore:
+    """SQLite store of title lookups, posters and scored reviews.
+
+    Reviews are kept per title with their IMDb review ID, so a refresh only has to fetch
+    the reviews newer than the newest one stored and only those need to be scored.
+    """
+
+    def __init__(self, path=REVIEW_STORE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def get_title_id(self, movie_name):
+        with self._lock:
+            row = self._conn.execute("SELECT title_id FROM titles WHERE name = ?",
+                                     (normalize_name(movie_name),)).fetchone()
+        return row[0] if row else None
+
+    def put_title_id(self, movie_name, title_id):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO titles VALUES (?, ?, ?)",
+                               (normalize_name(movie_name), title_id, time.time()))
+
+    def get_poster(self, title_id):
+        with self._lock:
+            row = self._conn.execute("SELECT poster_url FROM posters WHERE title_id = ?", (title_id,)).fetchone()
+        return row[0] if row else None
+
+    def put_poster(self, title_id, poster_url):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO posters VALUES (?, ?, ?)", (title_id, poster_url, time.time()))
+
+    def known_review_ids(self, title_id):
+        with self._lock:
+            rows = self._conn.execute("SELECT review_id FROM reviews WHERE title_id = ?", (title_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def add_reviews(self, title_id, reviews):
+        """Insert reviews as returned by imdb_fetch (id, text, rating, submitted), existing ones are kept"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO reviews (title_id, review_id, submitted, text, rating, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(title_id, review["id"], review.get("submitted"), review["text"], review.get("rating"), now)
+                 for review in reviews],
+            )
+
+    def get_reviews(self, title_id, limit=100):
+        """Newest reviews first, each with its stored sentiment (None until scored)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT review_id, text, rating, submitted, sentiment FROM reviews WHERE title_id = ? "
+                "ORDER BY submitted DESC, fetched_at DESC, rowid LIMIT ?",
+                (title_id, limit),
+            ).fetchall()
+        return [{"id": row[0], "text": row[1], "rating": row[2], "submitted": row[3], "sentiment": row[4]}
+                for row in rows]
+
+    def stored_sentiments(self, title_id):
+        """Review text -> sentiment for every scored review of the title"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text, sentiment FROM reviews WHERE title_id = ? AND sentiment IS NOT NULL", (title_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def save_sentiments(self, title_id, sentiments):
+        """Store predictions keyed by review text, texts without a stored review are skipped"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE reviews SET sentiment = ? WHERE title_id = ? AND text = ?",
+                [(sentiment, title_id, text) for text, sentiment in sentiments.items()],
+            )
+
+    def close(self):
+        self._conn.close()
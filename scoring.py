@@ -0,0 +1,13 @@
+#model output index -> label, same order as the classifier head
+LABELS = ["Negative", "Neutral", "Positive"]
+
+#stars given per review of each sentiment, the rating is the average over all reviews
+STAR_WEIGHTS = {"Positive": 10, "Neutral": 5, "Negative": 3}
+
+
+def star_score(sentiment_counts):
+    """Estimated rating out of 10 from the number of reviews per sentiment"""
+    total = sum(sentiment_counts.values())
+    if not total:
+        return None
+    return sum(STAR_WEIGHTS[label] * count for label, count in sentiment_counts.items()) / total
@@ -0,0 +1,196 @@
+"""Resumable review crawler for building the training corpus, replacing the loop in scrap.ipynb.
+
+    python -m scrapers.crawler --titles-file scrapers/movie_list_100.txt --out scrapers/corpus
+
+Titles are crawled concurrently under a per-host rate limit. Each finished title is
+appended to JSONL shards (one review per line) and then to checkpoint.jsonl, so a
+crash loses at most the titles in flight. Running the same command again skips every
+checkpointed title, and review IDs already in the shards are never written twice.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+import imdb_fetch
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+SHARD_PATTERN = "reviews-{:05d}.jsonl"
+
+
+def read_jsonl(path):
+    """Records of a JSONL file, a line cut short by a crash is skipped"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class Corpus:
+    """Append-only JSONL shards plus the checkpoint log of finished titles"""
+
+    def __init__(self, out_dir, shard_size=50000):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.done = set()
+        for record in read_jsonl(os.path.join(out_dir, CHECKPOINT_FILE)):
+            if not record.get("error"):
+                self.done.add(record["title_id"])
+
+        self.seen = set()
+        shards = sorted(glob.glob(os.path.join(out_dir, SHARD_PATTERN.replace("{:05d}", "*"))))
+        self.shard_index = len(shards) - 1 if shards else 0
+        self.shard_lines = 0
+        for path in shards:
+            self.shard_lines = 0
+            for record in read_jsonl(path):
+                self.seen.add(record["review_id"])
+                self.shard_lines += 1
+
+        self._shard = None
+        self._checkpoint = _open_append(os.path.join(out_dir, CHECKPOINT_FILE))
+
+    def _shard_file(self):
+        #the last shard may already be full when resuming, not only after a write of this run
+        if self.shard_lines >= self.shard_size:
+            if self._shard is not None:
+                self._shard.close()
+                self._shard = None
+            self.shard_index += 1
+            self.shard_lines = 0
+        if self._shard is None:
+            path = os.path.join(self.out_dir, SHARD_PATTERN.format(self.shard_index))
+            self._shard = _open_append(path)
+        return self._shard
+
+    def add_title(self, title_id, reviews, seconds):
+        """Write the title's new reviews, then checkpoint it. Returns how many were new."""
+        new = [review for review in reviews if review["id"] not in self.seen]
+        for review in new:
+            shard = self._shard_file()
+            shard.write(json.dumps({
+                "title_id": title_id,
+                "review_id": review["id"],
+                "review": review["text"],
+                "rating": review["rating"],
+                "submitted": review["submitted"],
+            }, ensure_ascii=False) + "\n")
+            self.shard_lines += 1
+            self.seen.add(review["id"])
+        if self._shard is not None:
+            _sync(self._shard)
+        self._log({"title_id": title_id, "reviews": len(new), "seconds": round(seconds, 2)})
+        self.done.add(title_id)
+        return len(new)
+
+    def add_failure(self, title_id, error):
+        #logged for the record, the title is crawled again on the next run
+        self._log({"title_id": title_id, "error": error})
+
+    def _log(self, record):
+        record["at"] = time.time()
+        self._checkpoint.write(json.dumps(record) + "\n")
+        _sync(self._checkpoint)
+
+    def close(self):
+        if self._shard is not None:
+            self._shard.close()
+        self._checkpoint.close()
+
+
+def _open_append(path):
+    f = open(path, "a", encoding="utf-8")
+    #end a line left half written by a crash so the next record starts on its own line
+    if f.tell() > 0:
+        with open(path, "rb") as existing:
+            existing.seek(-1, os.SEEK_END)
+            if existing.read(1) != b"\n":
+                f.write("\n")
+    return f
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+async def crawl_title(fetcher, corpus, title_id, per_title):
+    """Up to `per_title` reviews not already in the corpus, newest first"""
+    reviews = []
+    found = 0
+    async for page in fetcher.iter_review_pages(title_id):
+        found += len(page)
+        reviews.extend(review for review in page if review["id"] not in corpus.seen)
+        if len(reviews) >= per_title:
+            break
+    if not found:
+        #a page without __NEXT_DATA__ (changed markup or a soft block) must not be checkpointed
+        #as done with 0 reviews, fail it so the next run tries it again
+        raise LookupError("no reviews on the reviews page, no pagination data or blocked")
+    return reviews[:per_title]
+
+
+async def crawl(title_ids, args):
+    corpus = Corpus(args.out, args.shard_size)
+    todo = [title_id for title_id in title_ids if title_id not in corpus.done]
+    print(f"{len(title_ids) - len(todo)} titles already crawled, {len(todo)} to go, "
+          f"{len(corpus.seen)} reviews in the corpus")
+
+    fetcher = imdb_fetch.Fetcher(per_host_limit=args.workers, per_host_rate=args.rate)
+    workers = asyncio.Semaphore(args.workers)
+    finished = 0
+
+    async def run(title_id):
+        nonlocal finished
+        async with workers:
+            start = time.perf_counter()
+            try:
+                reviews = await crawl_title(fetcher, corpus, title_id, args.per_title)
+            except Exception as e:
+                corpus.add_failure(title_id, (str(e) or type(e).__name__).splitlines()[0])
+                print(f"{title_id}: failed, {e}")
+                return
+            #no await between the dedupe and the write, so concurrent titles cannot both add a review
+            new = corpus.add_title(title_id, reviews, time.perf_counter() - start)
+            finished += 1
+            print(f"[{finished}/{len(todo)}] {title_id}: {new} reviews")
+
+    try:
+        await asyncio.gather(*(run(title_id) for title_id in todo))
+    finally:
+        await fetcher.aclose()
+        corpus.close()
+    print(f"{len(corpus.done)} titles and {len(corpus.seen)} reviews in {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl IMDb reviews for a list of titles into JSONL shards")
+    parser.add_argument("title_ids", nargs="*", help="IMDb title IDs (tt...)")
+    parser.add_argument("--titles-file", action="append", default=[], help="file with one title ID per line")
+    parser.add_argument("--out", default="scrapers/corpus", help="directory for the shards and checkpoint")
+    parser.add_argument("--per-title", type=int, default=100, help="reviews to collect per title")
+    parser.add_argument("--workers", type=int, default=8, help="titles crawled at the same time")
+    parser.add_argument("--rate", type=float, default=imdb_fetch.IMDB_RATE_LIMIT or 5,
+                        help="IMDb requests per second (0 for no limit)")
+    parser.add_argument("--shard-size", type=int, default=50000, help="reviews per shard file")
+    args = parser.parse_args()
+
+    title_ids = list(args.title_ids)
+    for path in args.titles_file:
+        with open(path, encoding="utf-8") as f:
+            title_ids.extend(line.strip() for line in f if line.strip())
+    title_ids = list(dict.fromkeys(title_ids))
+    if not title_ids:
+        parser.error("no title IDs given")
+
+    asyncio.run(crawl(title_ids, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+import pytest
+import torch
+import transformers
+
+#the app is a set of top-level modules, make them importable however pytest is started
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WORDS = "this movie was great not my kind of film at all too long , . !".split()
+
+
+@pytest.fixture
+def model_and_tokenizer(tmp_path):
+    """A tiny randomly initialized BERT classifier and its word-level tokenizer"""
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    tokenizer = transformers.BertTokenizer(vocab_file=str(vocab))
+    torch.manual_seed(0)
+    config = transformers.BertConfig(vocab_size=5 + len(WORDS), hidden_size=16, num_hidden_layers=1,
+                                     num_attention_heads=2, intermediate_size=32, num_labels=3)
+    return transformers.BertForSequenceClassification(config).eval(), tokenizer
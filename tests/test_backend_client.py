@@ -0,0 +1,64 @@
+"""Retries of the backend client against a local server."""
+import gzip
+import http.server
+import json
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import pytest
+import backend_client
+
+
+def test_retry_after_seconds():
+    assert backend_client.retry_after_seconds("3") == 3
+    assert backend_client.retry_after_seconds(None) == 0
+    assert backend_client.retry_after_seconds("soon") == 0
+    assert backend_client.retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < backend_client.retry_after_seconds(later) <= 30
+
+
+@pytest.fixture
+def backend():
+    """A /predict that answers 503 with `retry_after` to the first `failures` requests"""
+    state = {"failures": 1, "retry_after": "3600", "requests": 0}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            state["requests"] += 1
+            if state["requests"] <= state["failures"]:
+                self.send_response(503)
+                self.send_header("Retry-After", state["retry_after"])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            out = json.dumps({"sentiments": ["Positive"] * len(json.loads(body)["reviews"])}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/predict"
+    yield state
+    server.shutdown()
+
+
+@pytest.mark.parametrize("retry_after", ["3600", "Fri, 31 Dec 2100 23:59:59 GMT", "not a date"])
+def test_retry_after_is_honoured_up_to_the_backoff_cap(backend, retry_after):
+    backend["retry_after"] = retry_after
+    client = backend_client.BackendClient(backend["url"], retries=2, backoff=0.05)
+    start = time.perf_counter()
+    assert client.predict(["a review"] * 3) == ["Positive"] * 3
+    #one retry, waiting at most the cap of backoff * 2**retries (plus jitter), not an hour
+    assert time.perf_counter() - start < 1
+    assert backend["requests"] == 2
+    client.close()
@@ -0,0 +1,53 @@
+"""Smoke tests for the compiled inference backends on a tiny randomly initialized model."""
+import json
+import os
+import pytest
+import torch
+import backends
+
+
+
+def test_onnx_export_writes_the_graph_and_its_source(model_and_tokenizer, tmp_path):
+    onnx = pytest.importorskip("onnx")
+    model, tokenizer = model_and_tokenizer
+    path = tmp_path / "onnx" / "model.onnx"
+    backends._export_onnx(model, tokenizer, str(path))
+    assert sorted(os.listdir(path.parent)) == ["model.onnx", "model.onnx.json"]
+    onnx.checker.check_model(str(path))
+
+
+def test_onnx_backend_matches_eager(model_and_tokenizer, tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    model, tokenizer = model_and_tokenizer
+    monkeypatch.setattr(backends, "ONNX_MODEL_PATH", str(tmp_path / "model.onnx"))
+    forward = backends.load_backend("onnx", model, tokenizer)
+    #a batch and length other than the export example, through the dynamic axes
+    inputs = tokenizer(["great film", "not my kind of movie , too long at all", "this was great !"],
+                       return_tensors="pt", padding=True)
+    with torch.no_grad():
+        expected = model(**inputs).logits
+    assert torch.allclose(forward(**inputs), expected, atol=1e-4)
+
+
+def test_onnx_backend_exports_again_for_another_revision(model_and_tokenizer, tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    model, tokenizer = model_and_tokenizer
+    path = tmp_path / "model.onnx"
+    monkeypatch.setattr(backends, "ONNX_MODEL_PATH", str(path))
+    inputs = tokenizer(["great film"], return_tensors="pt")
+
+    backends.load_backend("onnx", model, tokenizer)
+    exported = path.stat().st_mtime_ns
+    backends.load_backend("onnx", model, tokenizer)
+    assert path.stat().st_mtime_ns == exported
+
+    #new weights under a new revision must not be served from the old graph
+    with torch.no_grad():
+        model.classifier.bias.add_(1.0)
+        expected = model(**inputs).logits
+    model.config._commit_hash = "0123abc"
+    forward = backends.load_backend("onnx", model, tokenizer)
+    assert json.loads(path.with_name("model.onnx.json").read_text())["revision"] == "0123abc"
+    assert torch.allclose(forward(**inputs), expected, atol=1e-4)
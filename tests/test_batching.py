@@ -0,0 +1,109 @@
+"""MicroBatcher: requests share forward passes and each gets its own rows back."""
+import threading
+import time
+import pytest
+import torch
+import metrics
+from backends import load_backend
+from batching import MicroBatcher
+from inference import predict_logits
+
+
+def numbered(texts):
+    #row i of the output is the number in text i, so a row in the wrong place shows
+    return torch.tensor([[float(text.split()[-1])] for text in texts])
+
+
+def test_concurrent_requests_share_a_batch_and_get_their_own_rows():
+    calls = []
+
+    def predict_fn(texts):
+        calls.append(len(texts))
+        return numbered(texts)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=100, max_wait=0.2)
+    futures = [batcher.submit([f"review {i * 10 + j}" for j in range(i + 1)]) for i in range(5)]
+    for i, future in enumerate(futures):
+        assert future.result(timeout=5).flatten().tolist() == [i * 10 + j for j in range(i + 1)]
+    batcher.close()
+    assert calls == [15]
+
+
+def test_batch_closes_at_max_batch_size_without_splitting_requests():
+    calls = []
+
+    def predict_fn(texts):
+        calls.append(len(texts))
+        return numbered(texts)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait=0.2)
+    big = batcher.submit([f"review {i}" for i in range(6)])
+    small = batcher.submit(["review 99"])
+    assert big.result(timeout=5).flatten().tolist() == list(range(6))
+    assert small.result(timeout=5).flatten().tolist() == [99]
+    batcher.close()
+    assert calls == [6, 1]
+
+
+def test_failure_reaches_every_request_in_the_batch():
+    def predict_fn(texts):
+        raise ValueError("model broke")
+
+    batcher = MicroBatcher(predict_fn, max_wait=0.1)
+    futures = [batcher.submit(["review 1"]), batcher.submit(["review 2"])]
+    for future in futures:
+        with pytest.raises(ValueError, match="model broke"):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_cancelled_requests_are_skipped():
+    seen = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def predict_fn(texts):
+        seen.extend(texts)
+        started.set()
+        release.wait(5)
+        return numbered(texts)
+
+    batcher = MicroBatcher(predict_fn, max_wait=0)
+    first = batcher.submit(["review 1"])
+    started.wait(5)
+    #queued behind the running batch, the caller gives up before it runs
+    cancelled = batcher.submit(["review 2"])
+    kept = batcher.submit(["review 3"])
+    assert cancelled.cancel()
+    release.set()
+    assert first.result(timeout=5).item() == 1
+    assert kept.result(timeout=5).item() == 3
+    batcher.close()
+    assert seen == ["review 1", "review 3"]
+
+
+def test_caller_timings_get_the_batch_stages():
+    def predict_fn(texts):
+        with metrics.span("forward"):
+            time.sleep(0.01)
+        return numbered(texts)
+
+    batcher = MicroBatcher(predict_fn, max_wait=0.05)
+    with metrics.collect_timings() as timings:
+        batcher.predict(["review 1"])
+    batcher.close()
+    assert timings["queue_wait"] > 0
+    assert timings["forward"] >= 0.01
+
+
+def test_same_logits_as_one_request_at_a_time(model_and_tokenizer):
+    model, tokenizer = model_and_tokenizer
+    forward = load_backend("eager", model, tokenizer)
+    requests = [["great film", "not my kind of movie , too long"], ["this was great !"], ["too long", "my film"]]
+    expected = [predict_logits(forward, tokenizer, texts) for texts in requests]
+
+    batcher = MicroBatcher(lambda texts: predict_logits(forward, tokenizer, texts), max_wait=0.2)
+    futures = [batcher.submit(texts) for texts in requests]
+    for future, logits in zip(futures, expected):
+        assert torch.allclose(future.result(timeout=5), logits, atol=1e-5)
+    batcher.close()
@@ -0,0 +1,69 @@
+"""PredictionCache keys, LRU eviction and TTL."""
+import cache
+from cache import PredictionCache
+
+
+def test_key_ignores_whitespace_but_not_the_namespace():
+    first = PredictionCache("model@a:eager:128")
+    assert first.key("Great  film,\n loved it") == first.key("Great film, loved it")
+    assert first.key("great film") != first.key("Great film")
+    assert first.key("great film") != PredictionCache("model@b:eager:128").key("great film")
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = PredictionCache("ns", max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    #"b" is now the least recently used one
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert lru.stats()["size"] == 2
+
+
+def test_put_refreshes_an_existing_entry():
+    lru = PredictionCache("ns", max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    lru.put("a", 10)
+    lru.put("c", 3)
+    assert lru.get("a") == 10
+    assert lru.get("b") is None
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    ttl = PredictionCache("ns", ttl=60)
+    ttl.put("a", 1)
+    now[0] += 59
+    assert ttl.get("a") == 1
+    now[0] += 2
+    assert ttl.get("a") is None
+    assert ttl.stats()["size"] == 0
+
+
+def test_zero_ttl_keeps_entries_and_zero_size_stores_nothing(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    forever = PredictionCache("ns", ttl=0)
+    forever.put("a", 1)
+    now[0] += 10 ** 6
+    assert forever.get("a") == 1
+
+    disabled = PredictionCache("ns", max_entries=0)
+    disabled.put("a", 1)
+    assert disabled.get("a") is None
+
+
+def test_stats_count_hits_and_misses():
+    counted = PredictionCache("ns")
+    counted.put("a", 1)
+    counted.get("a")
+    counted.get("b")
+    counted.get("b")
+    stats = counted.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert abs(stats["hit_rate"] - 1 / 3) < 1e-9
@@ -0,0 +1,39 @@
+"""Corpus checkpointing and sharding of the review crawler."""
+import asyncio
+import os
+import pytest
+from scrapers import crawler
+
+
+def review(i):
+    return {"id": f"rw{i:07d}", "text": f"Review {i} is long enough to keep.", "rating": 7, "submitted": "2025-01-01"}
+
+
+def shard_lines(out_dir):
+    return [sum(1 for _ in open(out_dir / name)) for name in sorted(os.listdir(out_dir)) if name.startswith("reviews-")]
+
+
+def test_full_shard_rolls_over_after_resume(tmp_path):
+    corpus = crawler.Corpus(str(tmp_path), shard_size=2)
+    corpus.add_title("tt0000001", [review(1), review(2)], 0.1)
+    corpus.close()
+
+    corpus = crawler.Corpus(str(tmp_path), shard_size=2)
+    corpus.add_title("tt0000002", [review(3), review(4), review(5)], 0.1)
+    corpus.close()
+    assert shard_lines(tmp_path) == [2, 2, 1]
+
+
+class Blocked:
+    async def iter_review_pages(self, title_id):
+        #what iter_review_pages does for a page without __NEXT_DATA__
+        return
+        yield
+
+
+def test_page_without_reviews_is_not_checkpointed(tmp_path):
+    corpus = crawler.Corpus(str(tmp_path))
+    with pytest.raises(LookupError):
+        asyncio.run(crawler.crawl_title(Blocked(), corpus, "tt0000001", 100))
+    corpus.close()
+    assert "tt0000001" not in crawler.Corpus(str(tmp_path)).done
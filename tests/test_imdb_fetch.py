@@ -0,0 +1,145 @@
+"""Parser and pagination tests against saved IMDb pages in tests/fixtures."""
+import asyncio
+import json
+import time
+from pathlib import Path
+import httpx
+import imdb_fetch
+import metrics
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def fetcher(handler):
+    fetcher = imdb_fetch.Fetcher(base_url="https://imdb.test", graphql_url="https://graphql.imdb.test/",
+                                 retries=1, backoff=0)
+    fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return fetcher
+
+
+def run(fetcher, coro_fn, *args):
+    async def main():
+        try:
+            return await coro_fn(fetcher, *args)
+        finally:
+            await fetcher.aclose()
+    return asyncio.run(main())
+
+
+def imdb(graphql_pages, graphql_status=200):
+    """A handler serving the fixture pages, GraphQL pages are looked up by cursor"""
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.url.host == "graphql.imdb.test":
+            cursor = json.loads(request.content)["variables"]["after"]
+            if graphql_status != 200:
+                return httpx.Response(graphql_status)
+            return httpx.Response(200, text=fixture(graphql_pages[cursor]))
+        pages = {"/find": "find.html", "/title/tt0111161/": "title.html", "/title/tt0111161/reviews/": "reviews.html"}
+        if request.url.path not in pages:
+            return httpx.Response(404)
+        return httpx.Response(200, text=fixture(pages[request.url.path]))
+
+    handler.calls = calls
+    return handler
+
+
+PAGES = {"g4xpermabzwq": "reviews_page2.json", "g4wp7cbfyzqa": "reviews_page3.json"}
+
+
+def test_parse_title_id_takes_the_first_result():
+    assert imdb_fetch.parse_title_id(fixture("find.html")) == "tt0111161"
+
+
+def test_parse_poster():
+    assert imdb_fetch.parse_poster(fixture("title.html")).startswith("https://m.media-amazon.com/images/M/")
+
+
+def test_parse_reviews_skips_short_reviews():
+    reviews = imdb_fetch.parse_reviews(fixture("reviews.html"))
+    assert len(reviews) == 2
+    assert reviews[0].startswith("Still the best prison drama ever made.")
+
+
+def test_parse_next_data_first_page_and_cursor():
+    reviews, cursor = imdb_fetch.parse_review_connection(imdb_fetch.parse_next_data(fixture("reviews.html")))
+    assert cursor == "g4xpermabzwq"
+    assert [review["id"] for review in reviews] == ["rw9900001", "rw9900002"]
+    assert reviews[0]["text"] == "Still the best prison drama ever made. Morgan Freeman's narration carries every scene."
+    assert reviews[0]["rating"] == 10
+    assert reviews[0]["submitted"] == "2025-03-02"
+
+
+def test_parse_next_data_without_payload():
+    assert imdb_fetch.parse_next_data(fixture("title.html")) is None
+
+
+def test_parse_graphql_last_page_has_no_cursor():
+    reviews, cursor = imdb_fetch.parse_review_connection(json.loads(fixture("reviews_page3.json")))
+    assert cursor is None
+    assert [review["id"] for review in reviews] == ["rw9700001"]
+
+
+def test_pagination_follows_cursors_to_the_end():
+    handler = imdb(PAGES)
+    reviews = run(fetcher(handler), imdb_fetch.Fetcher.fetch_reviews_paginated, "tt0111161")
+    assert [review["id"] for review in reviews] == ["rw9900001", "rw9900002", "rw9800001", "rw9800002", "rw9700001"]
+    assert reviews[3]["text"] == "Well acted & well shot, though it leans hard on sentiment."
+    assert [method for method, _ in handler.calls] == ["GET", "POST", "POST"]
+
+
+def test_pagination_stops_at_target():
+    handler = imdb(PAGES)
+    reviews = run(fetcher(handler), imdb_fetch.Fetcher.fetch_reviews_paginated, "tt0111161", 3)
+    assert len(reviews) == 3
+    assert len(handler.calls) == 2
+
+
+def test_pagination_stops_at_a_known_review():
+    handler = imdb(PAGES)
+    reviews = run(fetcher(handler), imdb_fetch.Fetcher.fetch_reviews_paginated, "tt0111161", 100, {"rw9800002"})
+    assert [review["id"] for review in reviews] == ["rw9900001", "rw9900002", "rw9800001"]
+
+
+def test_failed_later_page_keeps_the_collected_reviews():
+    for status in (400, 503):
+        handler = imdb(PAGES, graphql_status=status)
+        reviews = run(fetcher(handler), imdb_fetch.Fetcher.fetch_reviews_paginated, "tt0111161")
+        assert [review["id"] for review in reviews] == ["rw9900001", "rw9900002"]
+
+
+def test_scrape_title():
+    movie_id, reviews, poster = run(fetcher(imdb(PAGES)), imdb_fetch.Fetcher.scrape_title, "shawshank")
+    assert movie_id == "tt0111161"
+    assert len(reviews) == 2
+    assert poster.endswith(".jpg")
+
+
+def test_each_kind_of_page_gets_its_own_span():
+    with metrics.collect_timings() as timings:
+        run(fetcher(imdb(PAGES)), imdb_fetch.Fetcher.scrape_title, "shawshank")
+        run(fetcher(imdb(PAGES)), imdb_fetch.Fetcher.fetch_reviews_paginated, "tt0111161")
+    assert {"title_lookup", "reviews_page", "poster", "reviews_graphql"} <= set(timings)
+    assert "fetch" not in timings
+
+
+def test_retry_after_date_is_parsed_and_capped():
+    statuses = iter([429, 503])
+
+    def handler(request):
+        status = next(statuses, 200)
+        if status != 200:
+            return httpx.Response(status, headers={"Retry-After": "Fri, 31 Dec 2100 23:59:59 GMT"})
+        return imdb(PAGES)(request)
+
+    client = imdb_fetch.Fetcher(base_url="https://imdb.test", retries=2, backoff=0.05)
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    start = time.perf_counter()
+    assert run(client, imdb_fetch.Fetcher.fetch_title_id, "shawshank") == "tt0111161"
+    assert time.perf_counter() - start < 2
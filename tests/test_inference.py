@@ -0,0 +1,134 @@
+"""Length bucketing and sliding windows in inference.py, on the tiny BERT model."""
+import pytest
+import torch
+import inference
+from backends import load_backend
+
+TEXTS = [
+    "great film",
+    "not my kind of movie , too long at all , this was too long for my kind of film",
+    "this movie was great !",
+    "too long",
+    "my kind of film , great",
+    "not great at all",
+]
+
+
+@pytest.fixture
+def forward(model_and_tokenizer):
+    model, tokenizer = model_and_tokenizer
+    return load_backend("eager", model, tokenizer)
+
+
+def one_by_one(forward, tokenizer, texts, max_length=128):
+    rows = []
+    for text in texts:
+        inputs = tokenizer([text], truncation=True, max_length=max_length, return_tensors="pt")
+        with torch.no_grad():
+            rows.append(forward(**inputs))
+    return torch.cat(rows)
+
+
+def test_make_buckets_sorts_by_length_and_respects_the_budget():
+    lengths = [5, 30, 12, 7, 30, 2]
+    buckets = inference.make_buckets(lengths, token_budget=40)
+    assert sorted(i for bucket in buckets for i in bucket) == list(range(len(lengths)))
+    order = [i for bucket in buckets for i in bucket]
+    assert [lengths[i] for i in order] == sorted(lengths)
+    for bucket in buckets:
+        assert len(bucket) * max(lengths[i] for i in bucket) <= 40 or len(bucket) == 1
+
+
+def test_make_buckets_oversized_text_gets_its_own_bucket():
+    assert inference.make_buckets([3, 50, 4], token_budget=10) == [[0, 2], [1]]
+
+
+def test_make_buckets_without_budget():
+    assert inference.make_buckets([3, 1, 2], token_budget=0) == [[1, 2, 0]]
+    assert inference.make_buckets([], token_budget=0) == []
+
+
+@pytest.mark.parametrize("token_budget", [0, 16, 4096])
+def test_predict_logits_keeps_input_order(model_and_tokenizer, forward, token_budget):
+    _, tokenizer = model_and_tokenizer
+    logits = inference.predict_logits(forward, tokenizer, TEXTS, token_budget=token_budget)
+    assert torch.allclose(logits, one_by_one(forward, tokenizer, TEXTS), atol=1e-5)
+
+
+def test_predict_logits_counts_padding(model_and_tokenizer, forward):
+    _, tokenizer = model_and_tokenizer
+    padding = ("padding",)
+    before = inference.TOKENS._values.get(padding, 0)
+    #two texts of very different lengths land in separate buckets, so no padding at all
+    inference.predict_logits(forward, tokenizer, [TEXTS[0], TEXTS[1]], token_budget=30)
+    assert inference.TOKENS._values.get(padding, 0) == before
+
+
+LONG = " ".join(["this movie was great", "not my kind of film", "at all , too long !"] * 4)
+
+
+def test_short_text_gets_one_window_equal_to_truncation(model_and_tokenizer):
+    _, tokenizer = model_and_tokenizer
+    windows, owners, weights, complete = inference.split_windows(tokenizer, ["great film"], max_length=10)
+    assert windows == [tokenizer("great film")["input_ids"]]
+    assert owners == [0]
+    assert weights == [2]
+    assert complete == [True]
+
+
+def test_long_text_windows_cover_it_from_first_to_last_token(model_and_tokenizer):
+    _, tokenizer = model_and_tokenizer
+    ids = tokenizer(LONG, add_special_tokens=False)["input_ids"]
+    windows, owners, weights, _ = inference.split_windows(tokenizer, [LONG], max_length=10, stride=6)
+    body = 10 - 2
+    cls, sep = tokenizer.cls_token_id, tokenizer.sep_token_id
+    assert all(window[0] == cls and window[-1] == sep and len(window) <= 10 for window in windows)
+    assert windows[0][1:-1] == ids[:body]
+    assert windows[-1][1:-1] == ids[-body:]
+    #windows 6 tokens apart, plus the last one aligned to the end of the text
+    assert len(windows) == len(range(0, len(ids) - body, 6)) + 1
+    assert owners == [0] * len(windows)
+    assert weights == [body] * len(windows)
+
+
+def test_max_windows_thins_the_longest_texts_keeping_first_and_last(model_and_tokenizer):
+    _, tokenizer = model_and_tokenizer
+    texts = ["great film", LONG, "not my kind of film"]
+    all_windows, all_owners, _, _ = inference.split_windows(tokenizer, texts, max_length=10, stride=4)
+    long_windows = [w for w, owner in zip(all_windows, all_owners) if owner == 1]
+    assert len(long_windows) > 6
+
+    windows, owners, _, complete = inference.split_windows(tokenizer, texts, max_length=10, stride=4, max_windows=6)
+    assert len(windows) <= 6
+    assert complete == [True, False, True]
+    kept = [w for w, owner in zip(windows, owners) if owner == 1]
+    assert kept[0] == long_windows[0]
+    assert kept[-1] == long_windows[-1]
+    assert all(window in long_windows for window in kept)
+    #the short texts are never thinned
+    assert owners.count(0) == 1 and owners.count(2) == 1
+
+
+def test_every_text_keeps_a_window_under_a_tiny_cap(model_and_tokenizer):
+    _, tokenizer = model_and_tokenizer
+    _, owners, _, _ = inference.split_windows(tokenizer, [LONG, LONG, "great film"], max_length=10, max_windows=1)
+    assert sorted(set(owners)) == [0, 1, 2]
+
+
+def test_window_limit():
+    assert inference._window_limit([1, 10, 10], max_windows=9) == 4
+    assert inference._window_limit([1, 10, 10], max_windows=2) == 1
+    assert inference._window_limit([3, 3], max_windows=100) == 3
+
+
+def test_pool_windows_is_the_token_weighted_mean():
+    window_logits = torch.tensor([[1.0, 0.0], [3.0, 2.0], [5.0, 5.0]])
+    pooled = inference.pool_windows(window_logits, owners=[0, 0, 1], weights=[1, 3, 7], num_texts=2)
+    assert torch.allclose(pooled, torch.tensor([[2.5, 1.5], [5.0, 5.0]]))
+
+
+def test_windowed_matches_truncation_for_short_texts(model_and_tokenizer, forward):
+    _, tokenizer = model_and_tokenizer
+    short = [text for text in TEXTS if len(text.split()) < 8]
+    windowed = inference.predict_logits_windowed(forward, tokenizer, short, max_length=16)
+    assert torch.allclose(windowed, inference.predict_logits(forward, tokenizer, short, max_length=16), atol=1e-5)
@@ -0,0 +1,64 @@
+"""Inference worker processes, and what happens to their jobs when one dies."""
+import os
+import signal
+import threading
+import time
+import pytest
+import torch
+import workers
+
+
+@pytest.fixture
+def pool(model_and_tokenizer):
+    model, tokenizer = model_and_tokenizer
+    pool = workers.WorkerPool(model, tokenizer, 2, 1)
+    yield pool
+    pool.close()
+
+
+def test_predict_matches_the_model(pool, model_and_tokenizer):
+    model, tokenizer = model_and_tokenizer
+    texts = ["great film", "not my kind of movie , too long"]
+    with torch.no_grad():
+        expected = model(**tokenizer(texts, return_tensors="pt", padding=True)).logits
+    assert torch.allclose(pool.predict(texts), expected, atol=1e-5)
+
+
+def test_dead_worker_fails_its_jobs_while_another_keeps_answering(pool):
+    #stopped, so the first job stays in flight on worker 0 until it is killed
+    os.kill(pool._processes[0].pid, signal.SIGSTOP)
+    stuck = pool.submit(["great film"])
+    pool.submit(["great film"]).result(timeout=10)
+
+    answered = []
+    stop = threading.Event()
+
+    def keep_busy():
+        while not stop.is_set():
+            answered.append(pool.predict(["this movie was great"]))
+            time.sleep(0.05)
+
+    busy = threading.Thread(target=keep_busy)
+    busy.start()
+    try:
+        time.sleep(0.5)
+        os.kill(pool._processes[0].pid, signal.SIGKILL)
+        with pytest.raises(RuntimeError, match="exited"):
+            stuck.result(timeout=2)
+        assert 0 in pool._dead
+        #the worker that is left keeps taking all the new work
+        before = len(answered)
+        time.sleep(0.5)
+        assert len(answered) > before
+        assert pool.predict(["not my kind of film"]).shape == (1, 3)
+    finally:
+        stop.set()
+        busy.join()
+
+
+def test_every_worker_dead(pool):
+    for process in pool._processes:
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+    with pytest.raises(RuntimeError, match="Every inference worker has exited"):
+        pool.submit(["great film"])
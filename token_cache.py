@@ -0,0 +1,214 @@
+"""Pre-tokenized review cache for fine-tuning and batch evaluation.
+
+Token IDs of every review are stored once, without padding, in one flat memory-mapped
+array plus an offsets index (row i is ids[offsets[i]:offsets[i + 1]]). Caches live in a
+directory named after a fingerprint of the tokenizer and max length, so a different
+tokenizer revision never reads stale IDs. Batches are padded only to their longest row.
+
+    python token_cache.py --data data/reviews --split train
+    python token_cache.py --data cleaned_sentiment_dataset.csv --name cleaned
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import torch
+from transformers import RobertaTokenizer
+import dataset
+from inference import make_buckets
+
+TOKEN_CACHE_DIR = os.getenv("TOKEN_CACHE_DIR", "token_cache")
+
+
+def tokenizer_fingerprint(tokenizer, max_length):
+    """Short hash of everything that changes the token IDs: vocab, merges, special tokens, truncation"""
+    digest = hashlib.sha256()
+    digest.update(f"{type(tokenizer).__name__}:{tokenizer.name_or_path}:{max_length}".encode())
+    digest.update(json.dumps(tokenizer.get_vocab(), sort_keys=True).encode())
+    digest.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True, default=str).encode())
+    bpe_ranks = getattr(tokenizer, "bpe_ranks", None)
+    if bpe_ranks:
+        digest.update(json.dumps(sorted(bpe_ranks.items(), key=lambda item: item[1]), default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+def texts_digest(texts):
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def cache_path(tokenizer, max_length, name, root=TOKEN_CACHE_DIR):
+    return os.path.join(root, tokenizer_fingerprint(tokenizer, max_length), name)
+
+
+def get_or_build(texts, tokenizer, name, max_length=128, labels=None, root=TOKEN_CACHE_DIR):
+    """Open the cache called `name` for this tokenizer, (re)building it when the texts changed"""
+    path = cache_path(tokenizer, max_length, name, root)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        cache = TokenCache(path)
+        if cache.meta.get("texts") == texts_digest(texts):
+            return cache
+    return build(texts, tokenizer, path, max_length, labels)
+
+
+def build(texts, tokenizer, path, max_length=128, labels=None, chunk_size=1000):
+    """Tokenize `texts` chunk by chunk into a cache at `path`, returns the opened TokenCache"""
+    dtype = np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max + 1 else np.int32
+    #write next to the final directory and rename, so a crash never leaves half a cache
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+
+    lengths = []
+    with open(os.path.join(tmp_path, "ids.bin"), "wb") as f:
+        for start in range(0, len(texts), chunk_size):
+            encoded = tokenizer(list(texts[start:start + chunk_size]), truncation=True, max_length=max_length)
+            for ids in encoded["input_ids"]:
+                np.asarray(ids, dtype=dtype).tofile(f)
+                lengths.append(len(ids))
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+    if labels is not None:
+        np.save(os.path.join(tmp_path, "labels.npy"), np.asarray(labels, dtype=np.int64))
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({
+            "tokenizer": tokenizer.name_or_path,
+            "fingerprint": tokenizer_fingerprint(tokenizer, max_length),
+            "max_length": max_length,
+            "dtype": np.dtype(dtype).name,
+            "pad_token_id": tokenizer.pad_token_id,
+            "rows": len(lengths),
+            "texts": texts_digest(texts),
+            "tokens": int(offsets[-1]),
+        }, f, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return TokenCache(path)
+
+
+class TokenCache:
+    """Read side of a cache written by `build`, the token IDs stay on disk until a batch touches them"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.lengths = np.diff(self.offsets)
+        self.pad_token_id = self.meta["pad_token_id"]
+        if self.offsets[-1]:
+            self.ids = np.memmap(os.path.join(path, "ids.bin"), dtype=self.meta["dtype"], mode="r")
+        else:
+            #numpy cannot map an empty file
+            self.ids = np.empty(0, dtype=self.meta["dtype"])
+        labels_path = os.path.join(path, "labels.npy")
+        self.labels = np.load(labels_path) if os.path.exists(labels_path) else None
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i):
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def pad(self, indices):
+        """input_ids and attention_mask for the rows, padded to the longest of them"""
+        width = int(self.lengths[indices].max()) if len(indices) else 0
+        input_ids = np.full((len(indices), width), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(indices), width), dtype=np.int64)
+        for row, i in enumerate(indices):
+            ids = self[i]
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        return {"input_ids": torch.from_numpy(input_ids), "attention_mask": torch.from_numpy(attention_mask)}
+
+    def batches(self, indices=None, token_budget=4096, shuffle=False, seed=0):
+        """Lists of row indices of similar length, each under `token_budget` padded tokens.
+
+        With `shuffle` the order of the batches is randomized, the bucketing stays by length.
+        """
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        buckets = [indices[bucket] for bucket in make_buckets(self.lengths[indices].tolist(), token_budget)]
+        if shuffle:
+            np.random.default_rng(seed).shuffle(buckets)
+        return buckets
+
+    def collate(self, rows):
+        """Dynamic padding collate_fn for a DataLoader or Trainer over a TokenCacheDataset"""
+        batch = self.pad(np.array([row["index"] for row in rows]))
+        if "labels" in rows[0]:
+            batch["labels"] = torch.tensor([row["labels"] for row in rows])
+        return batch
+
+    def predict_logits(self, forward, indices=None, token_budget=4096, device=None):
+        """Logits for the cached rows in `indices` order, without tokenizing anything"""
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        logits = None
+        #buckets hold positions in `indices`, so rows can be scattered straight back
+        for bucket in make_buckets(self.lengths[indices].tolist(), token_budget):
+            inputs = self.pad(indices[bucket])
+            if device is not None:
+                inputs = {k: v.to(device) for k, v in inputs.items()}
+            with torch.no_grad():
+                out = forward(**inputs)
+            if logits is None:
+                logits = out.new_empty((len(indices), out.shape[-1]))
+            logits[torch.tensor(bucket)] = out
+        return logits
+
+
+class TokenCacheDataset(torch.utils.data.Dataset):
+    """Rows of a TokenCache for a DataLoader or the HF Trainer, use `cache.collate` as the collator"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __getitem__(self, i):
+        row = {"index": i}
+        if self.cache.labels is not None:
+            row["labels"] = int(self.cache.labels[i])
+        return row
+
+
+def load_texts(data, split=None):
+    """Review texts and labels from a dataset.py directory or a CSV with review and label columns"""
+    if os.path.isdir(data):
+        table = dataset.load(data, split=split, columns=["text", "label"])
+        return table["text"].to_pylist(), table["label"].to_pylist()
+    df = pd.read_csv(data).dropna(subset=["review"])
+    labels = df["label"].tolist() if "label" in df.columns else None
+    return df["review"].astype(str).tolist(), labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize a dataset once into a memory-mapped token cache")
+    parser.add_argument("--data", default="data/reviews", help="dataset.py directory or a CSV")
+    parser.add_argument("--split", help="train or test, only for dataset directories")
+    parser.add_argument("--name", help="cache name, defaults to the split or 'all'")
+    parser.add_argument("--model", default="hetbhalani/roberta-enhanced-for-sentiment")
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--root", default=TOKEN_CACHE_DIR)
+    args = parser.parse_args()
+
+    tokenizer = RobertaTokenizer.from_pretrained(args.model)
+    texts, labels = load_texts(args.data, args.split)
+    path = cache_path(tokenizer, args.max_length, args.name or args.split or "all", args.root)
+
+    cache = build(texts, tokenizer, path, args.max_length, labels)
+    padded = len(cache) * args.max_length
+    print(f"{len(cache)} reviews, {cache.meta['tokens']} tokens in {path}, "
+          f"{cache.meta['tokens'] / max(padded, 1):.0%} of padding everything to {args.max_length}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import itertools
+import threading
+from concurrent.futures import Future
+import torch
+import torch.multiprocessing as mp
+from multiprocessing import connection
+import metrics
+from backends import load_backend
+from inference import predict_ids, predict_logits
+
+def _worker_main(worker_id, model, tokenizer, backend, num_threads, max_length, token_budget,
+                 warmup_batches, windowed, jobs, results):
+    #each worker owns its slice of the cores, interop threads only add contention here
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    torch.set_grad_enabled(False)
+
+    try:
+        forward = load_backend(backend, model, tokenizer)
+        for texts in warmup_batches:
+            predict_logits(forward, tokenizer, texts, max_length=max_length, token_budget=token_budget)
+    except Exception as e:
+        results.send((None, worker_id, None, repr(e), {}, []))
+        return
+    results.send((None, worker_id, None, None, {}, []))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, texts = job
+        #this process's metrics are never scraped, the stage timings and token counts
+        #go back with the result and are recorded by the server process
+        with metrics.capture() as events, metrics.collect_timings() as timings:
+            try:
+                if windowed:
+                    #already split into windows of token IDs by the server process
+                    logits = predict_ids(forward, tokenizer, texts, token_budget=token_budget)
+                else:
+                    logits = predict_logits(forward, tokenizer, texts, max_length=max_length, token_budget=token_budget)
+                logits, error = logits.numpy(), None
+            except Exception as e:
+                logits, error = None, repr(e)
+        results.send((job_id, worker_id, logits, error, timings, events))
+
+
+class WorkerPool:
+    """Runs the model in `num_workers` processes, each pinned to `threads_per_worker` threads.
+
+    The fp32 weights are moved to shared memory once in the parent and handed to every
+    worker, so the eager backend costs one copy of the weights however many workers run.
+    Backends that rewrite the weights (int8, torchscript, onnx) build their own copy in
+    each worker. `predict` sends a batch to the worker with the fewest jobs in flight.
+    With `windowed` the batches are lists of token IDs from `inference.split_windows`
+    instead of texts. The stages and token counts of each batch come back with its
+    logits, into the metrics of this process and the caller's `collect_timings()`.
+    """
+
+    def __init__(self, model, tokenizer, num_workers, threads_per_worker, backend="eager",
+                 max_length=128, token_budget=4096, warmup_batches=(), windowed=False):
+        ctx = mp.get_context("spawn")
+        model.share_memory()
+
+        #one results pipe per worker instead of a shared queue: a worker killed halfway through
+        #a write cannot hold a lock the others need, and its death shows up as the end of its
+        #own pipe, after everything it managed to send
+        pipes = [ctx.Pipe(duplex=False) for _ in range(num_workers)]
+        self._results = [reader for reader, _ in pipes]
+        self._jobs = [ctx.Queue() for _ in range(num_workers)]
+        self._in_flight = [0] * num_workers
+        #job id -> (future, worker id, caller's timings)
+        self._pending = {}
+        self._dead = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._collector = None
+        self._stop, self._stop_sender = ctx.Pipe(duplex=False)
+
+        self._processes = [
+            ctx.Process(
+                target=_worker_main,
+                args=(i, model, tokenizer, backend, threads_per_worker, max_length, token_budget,
+                      list(warmup_batches), windowed, self._jobs[i], pipes[i][1]),
+                name=f"inference-worker-{i}",
+                daemon=True,
+            )
+            for i in range(num_workers)
+        ]
+        for process in self._processes:
+            process.start()
+        #only the worker may hold the write end, or its pipe would never end when it dies
+        for _, writer in pipes:
+            writer.close()
+
+        #every worker reports once it has built its backend and run the warmup. one that
+        #dies before that (killed for memory, crashed in a native library) ends its pipe
+        starting = set(range(num_workers))
+        while starting:
+            for reader in connection.wait([self._results[i] for i in starting]):
+                worker_id = self._results.index(reader)
+                message = self._receive(worker_id)
+                if message is None:
+                    code = self._processes[worker_id].exitcode
+                    self.close()
+                    raise RuntimeError(f"Inference worker {worker_id} exited with code {code} before it was ready")
+                if message[3] is not None:
+                    self.close()
+                    raise RuntimeError(f"Inference worker {worker_id} failed to start: {message[3]}")
+                starting.discard(worker_id)
+
+        self._collector = threading.Thread(target=self._collect, name="worker-results", daemon=True)
+        self._collector.start()
+
+    @property
+    def num_workers(self):
+        return len(self._processes)
+
+    def submit(self, texts):
+        future = Future()
+        with self._lock:
+            alive = [i for i in range(len(self._jobs))
+                     if i not in self._dead and self._processes[i].exitcode is None]
+            if not alive:
+                raise RuntimeError("Every inference worker has exited")
+            job_id = next(self._ids)
+            worker_id = min(alive, key=self._in_flight.__getitem__)
+            self._in_flight[worker_id] += 1
+            self._pending[job_id] = (future, worker_id, metrics.current_timings())
+        self._jobs[worker_id].put((job_id, list(texts)))
+        return future
+
+    def predict(self, texts):
+        return self.submit(texts).result()
+
+    def _receive(self, worker_id):
+        """The next message from a worker, None once it has exited"""
+        try:
+            return self._results[worker_id].recv()
+        except (EOFError, OSError):
+            #the pipe ends as the process goes, give it a moment to have an exit code to report
+            self._processes[worker_id].join(timeout=1)
+            return None
+
+    def _fail_dead_worker(self, worker_id):
+        with self._lock:
+            self._dead.add(worker_id)
+            failed = [(job_id, future) for job_id, (future, owner, _) in self._pending.items() if owner == worker_id]
+            for job_id, _ in failed:
+                del self._pending[job_id]
+        code = self._processes[worker_id].exitcode
+        print(f"Inference worker {worker_id} exited with code {code}")
+        for _, future in failed:
+            future.set_exception(RuntimeError(f"Inference worker {worker_id} exited with code {code}"))
+
+    def _deliver(self, message):
+        job_id, worker_id, logits, error, timings, events = message
+        metrics.replay(events)
+        with self._lock:
+            self._in_flight[worker_id] -= 1
+            future, _, caller_timings = self._pending.pop(job_id, (None, None, None))
+        if future is None:
+            return
+        if caller_timings is not None:
+            metrics.merge_timings(caller_timings, timings)
+        if error is not None:
+            future.set_exception(RuntimeError(f"Inference worker {worker_id} failed: {error}"))
+        else:
+            future.set_result(torch.from_numpy(logits))
+
+    def _collect(self):
+        #wakes up for every result and for every worker exiting, whatever the others are doing
+        while True:
+            with self._lock:
+                live = [self._results[i] for i in range(len(self._results)) if i not in self._dead]
+            ready = connection.wait(live + [self._stop])
+            if self._stop in ready:
+                break
+            for reader in ready:
+                worker_id = self._results.index(reader)
+                message = self._receive(worker_id)
+                if message is None:
+                    self._fail_dead_worker(worker_id)
+                else:
+                    self._deliver(message)
+
+    def close(self):
+        #stop reading first, workers leaving below are not deaths to report
+        self._stop_sender.send(None)
+        if self._collector is not None:
+            self._collector.join()
+        for jobs in self._jobs:
+            jobs.put(None)
+            #a dead worker never drains its queue, do not wait on it at interpreter exit
+            jobs.cancel_join_thread()
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()